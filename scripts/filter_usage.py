@@ -17,7 +17,7 @@ Environment Variables:
 - FILTER_MOVEMENT_THRESHOLD: Movement detection threshold (default: 1.0)
 - FILTER_FORWARD_UPSTREAM_DATA: Forward data from upstream filters (default: True)
 - FILTER_SHOW_TEXT_OVERLAYS: Show text overlays on video frames (default: True)
-- FILTER_LOG_INTERVAL: Log data every N frames (default: 3)
+- FILTER_LOG_INTERVAL: Log an aggregated summary per topic every N frames (default: 300)
 """
 
 import sys, os
@@ -54,7 +54,7 @@ def main():
         'movement_threshold': float(os.getenv("FILTER_MOVEMENT_THRESHOLD", "1.0")),
         'forward_upstream_data': os.getenv("FILTER_FORWARD_UPSTREAM_DATA", "True").lower() == "true",
         'show_text_overlays': os.getenv("FILTER_SHOW_TEXT_OVERLAYS", "True").lower() == "true",
-        'log_interval': int(os.getenv("FILTER_LOG_INTERVAL", "3")),
+        'log_interval': int(os.getenv("FILTER_LOG_INTERVAL", "300")),
     }
     
     print("VizCal Filter Configuration:")
@@ -65,7 +65,7 @@ class TestIntegrationConfigNormalization:
         assert normalized.roi == []  # Default value
         assert normalized.forward_upstream_data is True  # Default value
         assert normalized.show_text_overlays is True  # Default value
-        assert normalized.log_interval == 3  # Default value
+        assert normalized.log_interval == 300  # Default value
 
     def test_boolean_validation(self):
         """Test boolean validation and conversion for new configuration parameters."""
@@ -129,15 +129,16 @@ class TestIntegrationConfigNormalization:
             normalized = Vizcal.normalize_config(config)
             assert isinstance(normalized.roi, list)
         
-        # Test string ROI - VizCal doesn't currently convert string lists
+        # Test string ROI - JSON lists are parsed
         config_string_roi = {
             'calculate_camera_stability': True,
             'shake_threshold': 5,
             'roi': '[]'
         }
         normalized = Vizcal.normalize_config(config_string_roi)
-        # Note: VizCal doesn't currently convert string lists to actual lists
-        assert normalized.roi == '[]'  # Currently stays as string
+        assert normalized.roi == []
+        normalized = Vizcal.normalize_config({**config_string_roi, 'roi': '[100, 200, 300, 400]'})
+        assert normalized.roi == [100, 200, 300, 400]
 
     def test_boolean_configuration(self):
         """Test boolean configuration options for new parameters."""
@@ -205,7 +206,7 @@ class TestIntegrationConfigNormalization:
             assert normalized.movement_threshold == 1.0  # Default value
             assert normalized.forward_upstream_data is True  # Default value
             assert normalized.show_text_overlays is True  # Default value
-            assert normalized.log_interval == 3  # Default value
+            assert normalized.log_interval == 300  # Default value
             
         finally:
             # Clean up environment variables
@@ -113,12 +113,9 @@ class TestSmokeSimple:
         assert config.show_text_overlays is True
         assert config.log_interval == 5
 
-    @patch('vizcal.filter.detect_camera_shake')
-    @patch('vizcal.filter.calc_video_properties')
-    @patch('vizcal.filter.text_on_image')
-    @patch('vizcal.filter.flag_stability')
-    def test_frame_processing(self, mock_flag_stability, mock_text_on_image, 
-                            mock_calc_video_properties, mock_detect_camera_shake):
+    @patch('vizcal.vizcal_utils.video_properties.calc_video_properties')
+    @patch('vizcal.filter.OverlayCompositor')
+    def test_frame_processing(self, mock_overlay_compositor, mock_calc_video_properties):
         """Test basic frame processing."""
         config_data = {
             'calculate_camera_stability': True,
@@ -141,9 +138,7 @@ class TestSmokeSimple:
         
         # Mock the return values
         mock_calc_video_properties.return_value = {'Frame Width': 640, 'Frame Height': 480}
-        mock_detect_camera_shake.return_value = (0.5, True)
-        mock_text_on_image.return_value = np.zeros((480, 640, 3), dtype=np.uint8)
-        mock_flag_stability.return_value = np.zeros((480, 640, 3), dtype=np.uint8)
+        mock_overlay_compositor.return_value.render.return_value = np.zeros((480, 640, 3), dtype=np.uint8)
         
         # Create a test frame
         test_image = np.zeros((480, 640, 3), dtype=np.uint8)
@@ -420,7 +415,7 @@ class TestSmokeSimple:
             assert normalized.movement_threshold == 1.0  # Default value
             assert normalized.forward_upstream_data is True  # Default value
             assert normalized.show_text_overlays is True  # Default value
-            assert normalized.log_interval == 3  # Default value
+            assert normalized.log_interval == 300  # Default value
             
         finally:
             # Clean up environment variables
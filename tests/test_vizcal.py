@@ -1,8 +1,20 @@
+import os
+import socket
+import tempfile
+import threading
+import time
 import unittest
+import urllib.request
 from unittest.mock import patch, MagicMock
 from vizcal.filter import Vizcal, VizcalConfig
+from vizcal.vizcal_utils.scheduler import AnalysisScheduler
+from vizcal.vizcal_utils.reporter import MetricsReporter
+from vizcal.vizcal_utils.utils import convert_dict_to_serializable
+from vizcal.vizcal_utils.smoothing import RollingStats
+from vizcal.vizcal_utils.video_properties import OverlayCompositor, text_on_image, flag_stability, extract_orb_features, estimate_camera_shake, analysis_size, downscale_for_analysis, probe_video_properties_async, replenish_points, StabilityEngine
 from openfilter.filter_runtime import Frame
 import numpy as np
+import cv2
 
 class TestVizcal(unittest.TestCase):
 
@@ -67,21 +79,21 @@ class TestVizcal(unittest.TestCase):
         self.assertIn('Average Shake Distance', result)
         self.assertIn('Camera Stability Category', result)
 
-    @patch('vizcal.filter.flag_stability')
-    @patch('vizcal.filter.text_on_image')
-    @patch('vizcal.filter.calc_video_properties')
+    @patch('vizcal.filter.OverlayCompositor')
+    @patch('vizcal.vizcal_utils.video_properties.calc_video_properties')
     @patch('vizcal.filter.convert_dict_to_serializable')
-    def test_process_single_topic(self, mock_convert_dict_to_serializable, mock_calc_video_properties, mock_text_on_image, mock_flag_stability):
+    def test_process_single_topic(self, mock_convert_dict_to_serializable, mock_calc_video_properties, mock_overlay_compositor):
         mock_calc_video_properties.return_value = {'Frame Width': 640, 'Frame Height': 480}
         mock_convert_dict_to_serializable.return_value = {'test': 'data'}
         # Create a dummy image
         dummy_image = np.zeros((480, 640, 3), dtype=np.uint8)
-        mock_text_on_image.return_value = dummy_image
-        mock_flag_stability.return_value = dummy_image
+        mock_overlay_compositor.return_value.render.return_value = dummy_image
 
         frames = {'main': MagicMock()}
         frames['main'].rw.image = dummy_image
         frames['main'].rw.data = {'meta': {'src': 'file://test.mp4'}}
+        frames['main'].image = frames['main'].rw.image
+        frames['main'].data = frames['main'].rw.data
 
         self.vizcal.setup(self.config)
         result = self.vizcal.process(frames)
@@ -89,18 +101,16 @@ class TestVizcal(unittest.TestCase):
         self.assertIn('main', result)
         self.assertIsInstance(result['main'], Frame)
 
-    @patch('vizcal.filter.flag_stability')
-    @patch('vizcal.filter.text_on_image')
-    @patch('vizcal.filter.calc_video_properties')
+    @patch('vizcal.filter.OverlayCompositor')
+    @patch('vizcal.vizcal_utils.video_properties.calc_video_properties')
     @patch('vizcal.filter.convert_dict_to_serializable')
-    def test_process_multi_topic(self, mock_convert_dict_to_serializable, mock_calc_video_properties, mock_text_on_image, mock_flag_stability):
+    def test_process_multi_topic(self, mock_convert_dict_to_serializable, mock_calc_video_properties, mock_overlay_compositor):
         """Test processing multiple topics with independent analysis."""
         mock_calc_video_properties.return_value = {'Frame Width': 640, 'Frame Height': 480}
         mock_convert_dict_to_serializable.return_value = {'test': 'data'}
         # Create a dummy image
         dummy_image = np.zeros((480, 640, 3), dtype=np.uint8)
-        mock_text_on_image.return_value = dummy_image
-        mock_flag_stability.return_value = dummy_image
+        mock_overlay_compositor.return_value.render.return_value = dummy_image
 
         # Create frames with multiple topics
         frames = {
@@ -109,8 +119,12 @@ class TestVizcal(unittest.TestCase):
         }
         frames['main'].rw.image = dummy_image
         frames['main'].rw.data = {'meta': {'src': 'file://test.mp4'}}
-        frames['stream2'].rw.image = dummy_image
+        frames['main'].image = frames['main'].rw.image
+        frames['main'].data = frames['main'].rw.data
+        frames['stream2'].rw.image = dummy_image.copy()
         frames['stream2'].rw.data = {'meta': {'src': 'file://test.mp4'}}
+        frames['stream2'].image = frames['stream2'].rw.image
+        frames['stream2'].data = frames['stream2'].rw.data
 
         self.vizcal.setup(self.config)
         result = self.vizcal.process(frames)
@@ -147,6 +161,8 @@ class TestVizcal(unittest.TestCase):
         for topic, frame in frames.items():
             frame.rw.image = dummy_image
             frame.rw.data = {'meta': {'src': 'file://test.mp4'}}
+            frame.image = frame.rw.image
+            frame.data = frame.rw.data
             frame.has_image = True
         
         # Process frames - should initialize topic states
@@ -161,13 +177,716 @@ class TestVizcal(unittest.TestCase):
         
         # Each topic state should have required fields
         for topic_state in self.vizcal.topic_states.values():
-            self.assertIn('prv_frame', topic_state)
+            self.assertIn('orb_features', topic_state)
             self.assertIn('old_gray', topic_state)
             self.assertIn('p0', topic_state)
             self.assertIn('video_properties_calculated', topic_state)
             self.assertIn('video_properties', topic_state)
             self.assertIn('frame_count', topic_state)
 
+    def test_stability_reuses_cached_orb_features(self):
+        """Test that ORB features are computed once per frame and reused on the next frame."""
+        self.vizcal.setup(self.config)
+        rng = np.random.default_rng(0)
+        base = rng.integers(0, 255, (480, 640, 3), dtype=np.uint8)
+        shifted = np.roll(base, 3, axis=1)
+        topic_state = {'orb_features': None}
+
+        with patch('vizcal.vizcal_utils.video_properties.extract_orb_features', wraps=extract_orb_features) as mock_extract:
+            self.vizcal.calculate_camera_stability_metrics_per_topic(base, topic_state)
+            result = self.vizcal.calculate_camera_stability_metrics_per_topic(shifted, topic_state)
+
+        self.assertEqual(mock_extract.call_count, 2)
+        self.assertIsNotNone(topic_state['orb_features'])
+        self.assertAlmostEqual(result['Average Shake Distance'], 3.0, delta=0.5)
+
+    def test_stability_engine_reused_per_topic(self):
+        """Test that each topic keeps one configured stability engine across frames."""
+        config = VizcalConfig(self.config, orb_nfeatures=200, orb_fast_threshold=10)
+        self.vizcal.setup(config)
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        topic_state = {'orb_features': None}
+
+        self.vizcal.calculate_camera_stability_metrics_per_topic(frame, topic_state)
+        engine = topic_state['stability_engine']
+        self.vizcal.calculate_camera_stability_metrics_per_topic(frame, topic_state)
+
+        self.assertIs(topic_state['stability_engine'], engine)
+        self.assertEqual(engine.orb.getMaxFeatures(), 200)
+        self.assertEqual(engine.orb.getFastThreshold(), 10)
+
+    def test_downscale_for_analysis(self):
+        """Test that the analysis image honours analysis_scale and analysis_max_width."""
+        gray = np.zeros((2160, 3840), dtype=np.uint8)
+
+        for kwargs, expected_scale, expected_shape in (
+            ({}, 1.0, (2160, 3840)),
+            ({'analysis_scale': 0.5}, 0.5, (1080, 1920)),
+            ({'analysis_scale': 0.5, 'analysis_max_width': 960}, 0.25, (540, 960)),
+        ):
+            scale, size = analysis_size(gray.shape, **kwargs)
+            self.assertEqual((scale, size), (expected_scale, expected_shape[::-1]), msg=kwargs)
+
+            small, scale = downscale_for_analysis(gray, **kwargs)
+            self.assertEqual(small.shape, expected_shape, msg=kwargs)
+            self.assertEqual(scale, expected_scale, msg=kwargs)
+
+        # A preallocated buffer of the analysis size receives the downscaled image
+        dst = np.empty((540, 960), dtype=np.uint8)
+        small, _ = downscale_for_analysis(gray, analysis_max_width=960, dst=dst)
+        self.assertIs(small, dst)
+
+    def test_downscaled_shake_reported_in_full_resolution(self):
+        """Test that shake measured on a downscaled image is mapped back to full-resolution pixels."""
+        config = VizcalConfig(self.config, analysis_scale=0.5)
+        self.vizcal.setup(config)
+        rng = np.random.default_rng(0)
+        base = cv2.resize(rng.integers(0, 255, (240, 320, 3), dtype=np.uint8), (640, 480), interpolation=cv2.INTER_NEAREST)
+        shifted = np.roll(base, 8, axis=1)
+        topic_state = {'orb_features': None}
+
+        self.vizcal.calculate_camera_stability_metrics_per_topic(base, topic_state)
+        result = self.vizcal.calculate_camera_stability_metrics_per_topic(shifted, topic_state)
+
+        self.assertAlmostEqual(result['Average Shake Distance'], 8.0, delta=1.0)
+
+    def test_process_converts_to_gray_once_per_frame(self):
+        """Test that stability and movement share a single grayscale conversion per frame."""
+        config = VizcalConfig(self.config, calculate_movement=True, calculate_video_properties=False, show_text_overlays=False)
+        self.vizcal.setup(config)
+        image = np.random.default_rng(0).integers(0, 255, (480, 640, 3), dtype=np.uint8)
+        frames = {'main': Frame(image, {'meta': {}}, 'BGR')}
+
+        with patch('vizcal.filter.cv2.cvtColor', wraps=cv2.cvtColor) as mock_cvt:
+            self.vizcal.process(frames)
+            self.vizcal.process(frames)
+
+        self.assertEqual(mock_cvt.call_count, 2)
+        self.assertNotIn('prv_frame', self.vizcal.topic_states['main'])
+        self.assertEqual(self.vizcal.topic_states['main']['old_gray'].ndim, 2)
+
+    def test_process_with_topic_workers_preserves_order(self):
+        """Test that thread-pool topic processing keeps input order with main first."""
+        config = VizcalConfig(self.config, calculate_movement=True, calculate_video_properties=False, topic_workers=4)
+        self.vizcal.setup(config)
+        self.assertIsNotNone(self.vizcal.topic_executor)
+        rng = np.random.default_rng(0)
+        topics = ['stream2', 'main', 'stream3', 'stream4']
+        frames = {topic: Frame(rng.integers(0, 255, (240, 320, 3), dtype=np.uint8), {'meta': {}}, 'BGR') for topic in topics}
+        frames['data_only'] = Frame({'some': 'data'})
+
+        try:
+            for _ in range(2):
+                result = self.vizcal.process(frames)
+        finally:
+            self.vizcal.shutdown()
+
+        self.assertEqual(list(result.keys()), ['main', 'stream2', 'stream3', 'stream4', 'data_only'])
+        for topic in topics:
+            self.assertEqual(result[topic].data['frame_number'], 1)
+        self.assertIsNone(self.vizcal.topic_executor)
+
+    def test_process_with_topic_processes(self):
+        """Test that sharded process mode analyzes every topic and keeps per-topic state in the workers."""
+        config = VizcalConfig(self.config, calculate_video_properties=False, topic_processes=2)
+        self.vizcal.setup(config)
+        rng = np.random.default_rng(0)
+        topics = ['stream2', 'main', 'stream3']
+        frames = {topic: Frame(rng.integers(0, 255, (240, 320, 3), dtype=np.uint8), {'meta': {}}, 'BGR') for topic in topics}
+
+        try:
+            for _ in range(2):
+                result = self.vizcal.process(frames)
+        finally:
+            self.vizcal.shutdown()
+
+        self.assertEqual(list(result.keys()), ['main', 'stream2', 'stream3'])
+        for topic in topics:
+            self.assertEqual(result[topic].data['frame_number'], 1)
+            self.assertIn('Camera Stability Category', result[topic].data)
+            self.assertEqual(result[topic].image.shape, (240, 320, 3))
+        self.assertEqual(self.vizcal.topic_states, {})
+        self.assertIsNone(self.vizcal.shard_pool)
+
+    def test_topic_roi_restricts_analysis(self):
+        """Test that analysis runs on the per-topic ROI, falling back to the global ROI."""
+        config = VizcalConfig(self.config, roi=[0, 0, 320, 240], topic_rois={'cam2': [100, 50, 200, 100]})
+        self.vizcal.setup(config)
+        image = np.zeros((480, 640, 3), dtype=np.uint8)
+
+        self.assertEqual(self.vizcal.preprocess_frame(image, self.vizcal.get_topic_roi('main'))['gray'].shape, (240, 320))
+        self.assertEqual(self.vizcal.preprocess_frame(image, self.vizcal.get_topic_roi('cam2'))['gray'].shape, (100, 200))
+        # ROIs are clipped to the frame and empty ROIs cover the whole frame
+        self.assertEqual(self.vizcal.preprocess_frame(image, [600, 400, 100, 100])['gray'].shape, (80, 40))
+        self.assertEqual(self.vizcal.preprocess_frame(image, [])['gray'].shape, (480, 640))
+
+    def test_video_properties_probed_in_background(self):
+        """Test that the probe does not block process() and its result is cached for the same source."""
+        probe_started, release_probe = threading.Event(), threading.Event()
+
+        def slow_probe(video_path):
+            probe_started.set()
+            release_probe.wait(5)
+            return {'Frame Width': 640, 'Frame Height': 480, 'FPS': 25.0}
+
+        config = VizcalConfig(self.config, calculate_camera_stability=False)
+        self.vizcal.setup(config)
+        frames = {'main': Frame(np.zeros((480, 640, 3), dtype=np.uint8), {'meta': {'src': 'file://background_probe.mp4'}}, 'BGR')}
+
+        with patch('vizcal.vizcal_utils.video_properties.calc_video_properties', side_effect=slow_probe) as mock_probe:
+            result = self.vizcal.process(frames)
+            self.assertTrue(probe_started.wait(5))
+            self.assertNotIn('FPS', result['main'].data)
+
+            release_probe.set()
+            self.vizcal.topic_states['main']['video_properties_future'].result(5)
+            result = self.vizcal.process(frames)
+            self.assertEqual(result['main'].data['FPS'], 25.0)
+
+            # A fresh setup probing the same source reuses the process-wide cache
+            self.vizcal.setup(config)
+            self.assertEqual(probe_video_properties_async('background_probe.mp4').result(5)['Frame Width'], 640)
+            self.assertEqual(mock_probe.call_count, 1)
+
+    def test_video_properties_per_topic_source(self):
+        """Test that every topic gets video properties, with one probe per distinct source."""
+        config = VizcalConfig(self.config, calculate_camera_stability=False)
+        self.vizcal.setup(config)
+        image = np.zeros((480, 640, 3), dtype=np.uint8)
+        sources = {'main': 'file://per_topic_a.mp4', 'stream2': 'file://per_topic_a.mp4', 'stream3': 'file://per_topic_b.mp4'}
+        frames = {topic: Frame(image, {'meta': {'src': src}}, 'BGR') for topic, src in sources.items()}
+
+        def probe(video_path):
+            return {'Frame Width': 640, 'Frame Height': 480, 'FPS': 25.0 if video_path == 'per_topic_a.mp4' else 30.0}
+
+        with patch('vizcal.vizcal_utils.video_properties.calc_video_properties', side_effect=probe) as mock_probe:
+            self.vizcal.process(frames)
+            for topic_state in self.vizcal.topic_states.values():
+                topic_state['video_properties_future'].result(5)
+            result = self.vizcal.process(frames)
+
+        self.assertEqual(mock_probe.call_count, 2)
+        self.assertEqual(result['main'].data['FPS'], 25.0)
+        self.assertEqual(result['stream2'].data['FPS'], 25.0)
+        self.assertEqual(result['stream3'].data['FPS'], 30.0)
+
+    def test_video_properties_heartbeat(self):
+        """Test that constant video properties are sent when known, then only on the heartbeat interval."""
+        image = np.zeros((120, 160, 3), dtype=np.uint8)
+
+        for interval, expected in ((3, [True, False, False, True, False, False, True]), (0, [True] + [False] * 6)):
+            config = VizcalConfig(self.config, calculate_camera_stability=False, static_properties_interval=interval)
+            self.vizcal.setup(config)
+            frames = {'main': Frame(image, {'meta': {'src': 'file://heartbeat.mp4'}}, 'BGR')}
+
+            with patch('vizcal.vizcal_utils.video_properties.calc_video_properties', return_value={'FPS': 25.0, 'Total Frame Count': 10}):
+                self.assertNotIn('FPS', self.vizcal.process(frames)['main'].data)
+                self.vizcal.topic_states['main']['video_properties_future'].result(5)
+                sent = ['FPS' in self.vizcal.process(frames)['main'].data for _ in range(7)]
+
+            self.assertEqual(sent, expected, msg=f"interval={interval}")
+
+    def test_stream_properties_from_frame_timestamps(self):
+        """Test that non-file sources get frame-derived properties without probing the source."""
+        config = VizcalConfig(self.config, calculate_camera_stability=False)
+        self.vizcal.setup(config)
+        image = np.zeros((480, 640, 3), dtype=np.uint8)
+
+        with patch('vizcal.filter.probe_video_properties_async') as mock_probe:
+            for frame_index, ts in enumerate([10.0, 10.1, 10.2, 10.3]):
+                result = self.vizcal.process({'main': Frame(image, {'meta': {'src': 'tcp://127.0.0.1:5550', 'ts': ts}}, 'BGR')})
+
+        mock_probe.assert_not_called()
+        data = result['main'].data
+        self.assertEqual(data['Frame Width'], 640)
+        self.assertEqual(data['Frame Height'], 480)
+        self.assertAlmostEqual(data['Effective FPS'], 10.0, places=1)
+        self.assertAlmostEqual(data['Frame Interval Jitter (ms)'], 0.0, places=1)
+        self.assertAlmostEqual(data['Effective Megapixels per Second'], 3.07, places=2)
+
+    def test_resolution_sent_with_static_properties(self):
+        """Test that the resolution is only sent when it changes while rolling stream properties are sent every frame."""
+        config = VizcalConfig(self.config, calculate_camera_stability=False, static_properties_interval=0)
+        self.vizcal.setup(config)
+        shapes = [(480, 640, 3)] * 3 + [(240, 320, 3)] * 2
+
+        results = []
+        for frame_index, shape in enumerate(shapes):
+            frame = Frame(np.zeros(shape, dtype=np.uint8), {'meta': {'src': 'tcp://127.0.0.1:5550', 'ts': 10.0 + 0.1 * frame_index}}, 'BGR')
+            results.append(self.vizcal.process({'main': frame})['main'].data)
+
+        self.assertEqual([data.get('Frame Width') for data in results], [640, None, None, 320, None])
+        self.assertEqual(results[3]['Frame Size (pixels)'], '320x240')
+        self.assertTrue(all('Effective FPS' in data for data in results[1:]))
+
+    def test_estimate_camera_shake_top_k_matches(self):
+        """Test that shake estimation works from cached point arrays with top-K match selection."""
+        rng = np.random.default_rng(0)
+        base = rng.integers(0, 255, (480, 640), dtype=np.uint8)
+        prev_features = extract_orb_features(base)
+        curr_features = extract_orb_features(np.roll(base, 4, axis=0))
+
+        self.assertEqual(prev_features[0].shape[1], 2)
+        for max_matches in (0, 50):
+            distance, shaky = estimate_camera_shake(prev_features, curr_features, shake_threshold=2, max_matches=max_matches)
+            self.assertAlmostEqual(float(distance), 4.0, delta=0.5)
+            self.assertTrue(shaky)
+
+    def test_keyframe_track_mode_reports_per_frame_shake(self):
+        """Test that keyframe mode runs ORB only on keyframes and tracks per-frame shake in between."""
+        config = VizcalConfig(self.config, shake_keyframe_interval=4, shake_keyframe_mode='track')
+        self.vizcal.setup(config)
+        rng = np.random.default_rng(0)
+        base = cv2.resize(rng.integers(0, 255, (120, 160, 3), dtype=np.uint8), (640, 480), interpolation=cv2.INTER_LINEAR)
+        topic_state = self.vizcal.get_topic_state('main')
+
+        with patch('vizcal.vizcal_utils.video_properties.extract_orb_features', wraps=extract_orb_features) as mock_extract:
+            distances = [
+                self.vizcal.calculate_camera_stability_metrics_per_topic(np.roll(base, 3 * i, axis=1), topic_state)['Average Shake Distance']
+                for i in range(9)
+            ]
+
+        # Frames 0, 4 and 8 are keyframes
+        self.assertEqual(mock_extract.call_count, 3)
+        for distance in distances[1:]:
+            self.assertAlmostEqual(distance, 3.0, delta=0.5)
+
+    def test_keyframe_hold_mode_repeats_metrics(self):
+        """Test that hold mode repeats the last metrics between keyframes."""
+        config = VizcalConfig(self.config, shake_keyframe_interval=3, shake_keyframe_mode='hold')
+        self.vizcal.setup(config)
+        topic_state = self.vizcal.get_topic_state('main')
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+
+        with patch.object(StabilityEngine, 'extract', return_value=(None, None)) as mock_extract:
+            for _ in range(7):
+                result = self.vizcal.calculate_camera_stability_metrics_per_topic(frame, topic_state)
+
+        self.assertEqual(mock_extract.call_count, 3)
+        self.assertEqual(result['Camera Stability Category'], 'Video is Stable')
+
+    def test_keyframe_hold_mode_reports_per_frame_shake(self):
+        """Test that a hold-mode keyframe step is divided over the keyframe interval."""
+        config = VizcalConfig(self.config, calculate_video_properties=False, shake_keyframe_interval=4, shake_keyframe_mode='hold', show_text_overlays=False)
+        self.vizcal.setup(config)
+        rng = np.random.default_rng(0)
+        base = cv2.resize(rng.integers(0, 255, (120, 160, 3), dtype=np.uint8), (640, 480), interpolation=cv2.INTER_LINEAR)
+
+        distances = [
+            self.vizcal.process({'main': Frame(np.roll(base, 2 * i, axis=1), {}, 'BGR')})['main'].data['Average Shake Distance']
+            for i in range(9)
+        ]
+
+        # Frames 1-3 hold the first keyframe's metrics, frames 4 and 8 measure 8 px over 4 frames
+        self.assertEqual(distances[:4], [0.0] * 4)
+        for distance in distances[4:]:
+            self.assertAlmostEqual(distance, 2.0, delta=0.3)
+
+    def test_invalid_keyframe_mode_rejected(self):
+        """Test that an unknown shake_keyframe_mode is rejected during normalization."""
+        with self.assertRaises(ValueError):
+            Vizcal.normalize_config({'shake_keyframe_mode': 'skip'})
+
+    def test_scheduler_backs_off_under_load_and_recovers(self):
+        """Test that the scheduler raises the stride under backpressure and lowers it with headroom."""
+        scheduler = AnalysisScheduler(target_load=0.8, max_stride=8)
+        timestamp = 0.0
+
+        def run(cost, frames):
+            nonlocal timestamp
+            for _ in range(frames):
+                timestamp += 1 / 30
+                if scheduler.should_analyze('main', timestamp):
+                    scheduler.record('main', cost)
+
+        run(0.1, 200)
+        self.assertGreaterEqual(scheduler.stride('main'), 4)
+        self.assertLessEqual(scheduler.load(), 0.8)
+
+        run(0.005, 200)
+        self.assertEqual(scheduler.stride('main'), 1)
+
+    def test_skipped_frames_forward_stale_metrics(self):
+        """Test that frames skipped by the scheduler carry the last metrics marked as stale."""
+        config = VizcalConfig(self.config, calculate_video_properties=False, adaptive_scheduling=True)
+        self.vizcal.setup(config)
+        frame = Frame(np.zeros((480, 640, 3), dtype=np.uint8), {'meta': {}}, 'BGR')
+
+        first = self.vizcal.process({'main': frame})['main'].data
+        self.vizcal.scheduler.topics['main']['stride'] = 2
+        with patch.object(self.vizcal.scheduler, 'record'):
+            second = self.vizcal.process({'main': frame})['main'].data
+            third = self.vizcal.process({'main': frame})['main'].data
+
+        self.assertFalse(first['Metrics Stale'])
+        self.assertTrue(second['Metrics Stale'])
+        self.assertEqual(second['Camera Stability Category'], first['Camera Stability Category'])
+        self.assertFalse(third['Metrics Stale'])
+
+    def test_strided_analysis_reports_per_frame_distances(self):
+        """Test that a constant pan reports the same per-frame shake and movement at stride 1 and 3."""
+        rng = np.random.default_rng(0)
+        base = cv2.GaussianBlur(cv2.resize(rng.integers(0, 255, (60, 80, 3), dtype=np.uint8), (640, 480), interpolation=cv2.INTER_LINEAR), (5, 5), 0)
+
+        for method in ('lk', 'dis'):
+            config = VizcalConfig(self.config, calculate_video_properties=False, calculate_movement=True, movement_method=method, adaptive_scheduling=True, show_text_overlays=False)
+            self.vizcal.setup(config)
+            self.vizcal.scheduler.topics['main'] = {'stride': 3, 'skipped': 0, 'cost': None, 'interval': None, 'last_ts': None}
+
+            analyzed = []
+            with patch.object(self.vizcal.scheduler, 'record'):
+                for index in range(12):
+                    data = self.vizcal.process({'main': Frame(np.roll(base, 2 * index, axis=1), {'meta': {}}, 'BGR')})['main'].data
+                    if not data['Metrics Stale']:
+                        analyzed.append(data)
+
+            # Every third frame is analyzed, each 6 px after the previous analyzed one
+            self.assertEqual(len(analyzed), 4)
+            for data in analyzed[1:]:
+                self.assertAlmostEqual(data['Average Shake Distance'], 2.0, delta=0.3)
+                self.assertAlmostEqual(data['Movement Distance'], 2.0, delta=0.5, msg=method)
+                self.assertEqual(data['Camera Stability Category'], "Video is Stable")
+
+    def test_movement_recovers_after_analysis_error(self):
+        """Test that a failed analysis does not leave the previous gray image aliased with the next frame."""
+        rng = np.random.default_rng(0)
+        base = cv2.GaussianBlur(cv2.resize(rng.integers(0, 255, (60, 80, 3), dtype=np.uint8), (640, 480), interpolation=cv2.INTER_LINEAR), (5, 5), 0)
+        config = VizcalConfig(self.config, calculate_video_properties=False, calculate_movement=True, shake_keyframe_interval=3, show_text_overlays=False)
+        self.vizcal.setup(config)
+
+        def process(index):
+            return self.vizcal.process({'main': Frame(np.roll(base, 4 * index, axis=1), {}, 'BGR')})['main'].data
+
+        for index in range(3):
+            process(index)
+        with patch.object(self.vizcal, 'calculate_movement_metrics_per_topic', side_effect=RuntimeError("boom")):
+            self.assertTrue(process(3)['Analysis Error'])
+        result = process(4)
+
+        self.assertNotIn('Analysis Error', result)
+        self.assertAlmostEqual(result['Movement Distance'], 4.0, delta=0.5)
+        self.assertAlmostEqual(result['Average Shake Distance'], 4.0, delta=0.5)
+
+    def test_shake_keyframe_reset_on_resolution_change(self):
+        """Test that a frame size change between keyframes starts a fresh keyframe instead of failing analysis."""
+        rng = np.random.default_rng(0)
+        base = cv2.GaussianBlur(cv2.resize(rng.integers(0, 255, (60, 80, 3), dtype=np.uint8), (640, 480), interpolation=cv2.INTER_LINEAR), (5, 5), 0)
+        config = VizcalConfig(self.config, calculate_video_properties=False, calculate_movement=True, shake_keyframe_interval=5, shake_keyframe_mode='track', show_text_overlays=False)
+        self.vizcal.setup(config)
+
+        results = []
+        for index in range(6):
+            image = np.roll(base, 4 * index, axis=1)
+            if index >= 2:
+                image = cv2.resize(image, (320, 240), interpolation=cv2.INTER_AREA)
+            results.append(self.vizcal.process({'main': Frame(image, {}, 'BGR')})['main'].data)
+
+        self.assertFalse(any(data.get('Analysis Error') for data in results))
+        self.assertEqual(results[2]['Average Shake Distance'], 0.0)
+        self.assertEqual(self.vizcal.topic_states['main']['keyframe_shape'], (240, 320))
+        self.assertAlmostEqual(results[4]['Average Shake Distance'], 2.0, delta=0.5)
+
+    def test_replenish_points_tops_up_empty_cells(self):
+        """Test that points are only re-detected in grid cells that lost their features."""
+        rng = np.random.default_rng(0)
+        gray = cv2.resize(rng.integers(0, 255, (60, 80), dtype=np.uint8), (320, 240), interpolation=cv2.INTER_LINEAR)
+        feature_params = dict(maxCorners=100, qualityLevel=0.01, minDistance=7, blockSize=7)
+
+        points = replenish_points(gray, None, feature_params, target_points=64, grid=4)
+        self.assertGreaterEqual(len(points), 48)
+
+        # Drop every point in the top-left cell and top up again
+        in_top_left = (points[:, 0, 0] < 80) & (points[:, 0, 1] < 60)
+        kept = points[~in_top_left]
+        replenished = replenish_points(gray, kept, feature_params, target_points=64, grid=4)
+        np.testing.assert_array_equal(replenished[:len(kept)], kept)
+        new_points = replenished[len(kept):, 0]
+        self.assertGreater(len(new_points), 0)
+        self.assertTrue(np.all((new_points[:, 0] < 80) & (new_points[:, 1] < 60)))
+
+    def test_movement_tracker_measures_shift(self):
+        """Test that the incremental tracker reports per-frame movement on a steadily moving scene."""
+        config = VizcalConfig(self.config, calculate_movement=True)
+        self.vizcal.setup(config)
+        rng = np.random.default_rng(0)
+        base = cv2.resize(rng.integers(0, 255, (120, 160, 3), dtype=np.uint8), (640, 480), interpolation=cv2.INTER_LINEAR)
+        topic_state = self.vizcal.get_topic_state('main')
+
+        for i in range(5):
+            result = self.vizcal.calculate_movement_metrics_per_topic(np.roll(base, 2 * i, axis=1), topic_state)
+            self.assertGreaterEqual(len(topic_state['p0']), 50)
+
+        self.assertAlmostEqual(result['Movement Distance'], 2.0, delta=0.3)
+        self.assertTrue(result['Movement Detected'])
+
+    def test_movement_rolls_previous_gray_through_double_buffer(self):
+        """Test that old_gray follows the latest frame and alternates between two preallocated buffers."""
+        config = VizcalConfig(self.config, calculate_movement=True, calculate_camera_stability=False, calculate_video_properties=False)
+        self.vizcal.setup(config)
+        rng = np.random.default_rng(0)
+        images = [rng.integers(0, 255, (240, 320, 3), dtype=np.uint8) for _ in range(3)]
+
+        old_grays = []
+        for image in images:
+            self.vizcal.process({'main': Frame(image, {'meta': {}}, 'BGR')})
+            topic_state = self.vizcal.topic_states['main']
+            old_grays.append(topic_state['old_gray'])
+            np.testing.assert_array_equal(topic_state['old_gray'], cv2.cvtColor(image, cv2.COLOR_BGR2GRAY))
+
+        buffers = topic_state['gray_buffers']['gray']
+        self.assertTrue(any(old_grays[0] is buffer for buffer in buffers))
+        self.assertIsNot(old_grays[0], old_grays[1])
+        self.assertIs(old_grays[0], old_grays[2])
+
+    def test_dense_movement_backends(self):
+        """Test that DIS and Farneback backends report global motion in full-resolution pixels."""
+        rng = np.random.default_rng(0)
+        base = cv2.GaussianBlur(cv2.resize(rng.integers(0, 255, (60, 80, 3), dtype=np.uint8), (640, 480), interpolation=cv2.INTER_LINEAR), (9, 9), 0)
+
+        for method in ('dis', 'farneback'):
+            config = VizcalConfig(self.config, calculate_movement=True, movement_method=method, dense_flow_max_width=320)
+            self.vizcal.setup(config)
+            topic_state = self.vizcal.get_topic_state(method)
+
+            first = self.vizcal.calculate_movement_metrics_per_topic(base, topic_state)
+            result = self.vizcal.calculate_movement_metrics_per_topic(np.roll(base, 8, axis=1), topic_state)
+
+            self.assertEqual(first['Moving Pixel Fraction'], 0.0)
+            self.assertAlmostEqual(result['Global Motion X'], 8.0, delta=1.5, msg=method)
+            self.assertAlmostEqual(result['Global Motion Y'], 0.0, delta=1.0, msg=method)
+            self.assertGreater(result['Moving Pixel Fraction'], 0.5)
+            self.assertTrue(result['Movement Detected'])
+
+    def test_readonly_frame_forwarded_without_copy(self):
+        """Test that without overlays a read-only image is analyzed and forwarded without a copy."""
+        config = VizcalConfig(self.config, show_text_overlays=False, calculate_movement=True)
+        self.vizcal.setup(config)
+
+        image = np.random.randint(0, 255, (480, 640, 3), dtype=np.uint8)
+        image.flags.writeable = False
+        frame = Frame(image, {'meta': {'id': 1}}, 'BGR')
+
+        result = self.vizcal.process({'main': frame})['main']
+        self.assertIs(result.image, image)
+        self.assertIn('Camera Stability Category', result.data)
+        self.assertEqual(result.data['meta'], {'id': 1})
+
+    def test_overlay_compositor_matches_direct_drawing(self):
+        """Test that the overlay matches text_on_image/flag_stability with labels and lights cached per frame size."""
+        compositor = OverlayCompositor()
+        image = np.random.randint(0, 255, (480, 640, 3), dtype=np.uint8)
+
+        for category in ("Video is Stable", "Video is Unstable"):
+            for shake in (1.5, 12.07, None):
+                data = {"Brightness Category (HSV)": "Bright", "Average Shake Distance": shake, "Camera Stability Category": category}
+                expected = flag_stability(text_on_image(image.copy(), data), data)
+                result = compositor.render(image.copy(), data)
+                self.assertLessEqual(np.abs(expected.astype(int) - result).max(), 1, msg=(category, shake))
+
+        labels = compositor.labels
+        compositor.render(image.copy(), data)
+        self.assertIs(compositor.labels, labels)
+        self.assertEqual(len(compositor.lights), 2)
+
+        compositor.render(np.zeros((240, 320, 3), dtype=np.uint8), data)
+        self.assertIsNot(compositor.labels, labels)
+
+    def test_overlay_compositor_no_slower_with_changing_values(self):
+        """Test that drawing values that change every frame is no slower than direct drawing."""
+        compositor = OverlayCompositor()
+        image = np.random.randint(0, 255, (1080, 1920, 3), dtype=np.uint8)
+        frames = [
+            {"Brightness Category (HSV)": "Bright", "Average Shake Distance": round(index * 0.37, 2),
+             "Camera Stability Category": "Video is Stable" if index % 3 else "Video is Unstable"}
+            for index in range(200)
+        ]
+
+        def direct(image, data):
+            return flag_stability(text_on_image(image, data), data)
+
+        def best_time(draw):
+            times = []
+            for _ in range(5):
+                start = time.perf_counter()
+                for data in frames:
+                    draw(image, data)
+                times.append(time.perf_counter() - start)
+            return min(times)
+
+        compositor.render(image, frames[0])
+        self.assertLessEqual(best_time(compositor.render), best_time(direct) * 1.2)
+
+    def test_metrics_reporter_emits_aggregated_summary(self):
+        """Test that the reporter aggregates per topic and emits one summary every interval frames."""
+        log = MagicMock()
+        reporter = MetricsReporter(3, log=log)
+
+        for shake, category in ((1.0, "Video is Stable"), (3.0, "Video is Stable")):
+            self.assertIsNone(reporter.update('main', {"Average Shake Distance": shake, "Camera Stability Category": category}, {'stability': 0.002}))
+        self.assertIsNone(reporter.update('other', {"Average Shake Distance": 9.0}))
+        record = reporter.update('main', {"Average Shake Distance": 8.0, "Camera Stability Category": "Video is Unstable"}, {'stability': 0.004})
+
+        self.assertEqual(record['frames'], 3)
+        self.assertEqual(record['shake_distance'], {'mean': 4.0, 'max': 8.0})
+        self.assertEqual(record['stability_categories'], {"Video is Stable": 2, "Video is Unstable": 1})
+        self.assertEqual(record['timings_ms']['stability'], {'mean': 2.667, 'max': 4.0})
+        log.info.assert_called_once()
+
+        # Aggregates restart after each summary
+        self.assertIsNone(reporter.update('main', {"Average Shake Distance": 1.0}))
+
+    def test_stage_timing_stats(self):
+        """Test that stage timing keeps per-topic percentiles and publishes them under the reserved key."""
+        config = VizcalConfig(self.config, calculate_movement=True, stage_timing_in_data=True, stage_timing_window=4, shake_keyframe_interval=3, shake_keyframe_mode='track')
+        self.vizcal.setup(config)
+
+        image = np.random.randint(0, 255, (240, 320, 3), dtype=np.uint8)
+        for _ in range(6):
+            result = self.vizcal.process({'main': Frame(image, {}, 'BGR')})['main']
+
+        stats = self.vizcal.get_stats()['main']
+        for stage in ('grayscale', 'orb', 'match', 'affine', 'shake_lk', 'lk', 'overlay', 'serialize', 'frame', 'total'):
+            self.assertIn(stage, stats)
+        # Shake keyframe tracking runs on the 4 frames between keyframes, movement tracking on every frame after the first
+        self.assertEqual(stats['shake_lk']['count'], 4)
+        self.assertEqual(stats['lk']['count'], 5)
+        self.assertEqual(stats['total']['count'], 6)
+        self.assertLessEqual(stats['total']['p50_ms'], stats['total']['p99_ms'])
+        self.assertEqual(result.data['_vizcal_timing']['total']['count'], 5)
+
+    def test_metrics_exporter_textfile_and_errors(self):
+        """Test that counters, gauges and latency histograms are exported and analysis errors are counted."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'vizcal.prom')
+            config = VizcalConfig(self.config, metrics_textfile=path, metrics_textfile_interval=0)
+            self.vizcal.setup(config)
+
+            image = np.random.randint(0, 255, (240, 320, 3), dtype=np.uint8)
+            self.vizcal.process({'main': Frame(image, {}, 'BGR')})
+            with patch.object(self.vizcal, 'calculate_movement_metrics_per_topic', side_effect=RuntimeError("boom")):
+                result = self.vizcal.process({'main': Frame(image, {}, 'BGR')})['main']
+
+            self.assertTrue(result.data['Analysis Error'])
+            self.assertTrue(result.data['Metrics Stale'])
+            self.assertIn('Average Shake Distance', result.data)
+
+            with open(path) as file:
+                text = file.read()
+            self.vizcal.shutdown()
+
+        self.assertIn('vizcal_batches_total 2', text)
+        self.assertIn('vizcal_frames_processed_total{topic="main"} 2', text)
+        self.assertIn('vizcal_analysis_errors_total{topic="main"} 1', text)
+        self.assertIn('vizcal_shake_distance_pixels{topic="main"} 0.0', text)
+        self.assertIn('vizcal_stage_latency_seconds_count{topic="main",stage="orb"}', text)
+
+    def test_metrics_exporter_http(self):
+        """Test that metrics are served over HTTP."""
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+
+        self.vizcal.setup(VizcalConfig(self.config, metrics_port=port, metrics_host='127.0.0.1'))
+        try:
+            self.vizcal.process({'cam1': Frame(np.zeros((120, 160, 3), dtype=np.uint8), {}, 'BGR')})
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/metrics', timeout=5) as response:
+                text = response.read().decode()
+        finally:
+            self.vizcal.shutdown()
+
+        self.assertIn('# TYPE vizcal_frames_processed_total counter', text)
+        self.assertIn('vizcal_frames_processed_total{topic="cam1"} 1', text)
+
+    def test_convert_dict_to_serializable_handles_arrays_and_bools(self):
+        """Test that numpy arrays, numpy bools and nested containers are converted to native types."""
+        data = {'array': np.array([[1, 2]], dtype=np.int32), 'flag': np.bool_(True), 'nested': {'values': (np.float32(0.5), np.uint8(3))}, 'text': 'ok'}
+        result = convert_dict_to_serializable(data)
+
+        self.assertEqual(result, {'array': [[1, 2]], 'flag': True, 'nested': {'values': [0.5, 3]}, 'text': 'ok'})
+        self.assertIs(type(result['flag']), bool)
+        self.assertIs(type(result['nested']['values'][1]), int)
+
+    def test_output_payload_uses_native_types(self):
+        """Test that every analysis produces native Python types, so the payload needs no serialization pass."""
+        def assert_native(value):
+            if isinstance(value, dict):
+                for item in value.values():
+                    assert_native(item)
+            elif isinstance(value, (list, tuple)):
+                for item in value:
+                    assert_native(item)
+            else:
+                self.assertIn(type(value), (str, int, float, bool, type(None)), msg=repr(value))
+
+        image = np.random.randint(0, 255, (240, 320, 3), dtype=np.uint8)
+        for method in ('lk', 'dis'):
+            config = VizcalConfig(self.config, calculate_movement=True, movement_method=method, adaptive_scheduling=True, stage_timing_in_data=True)
+            self.vizcal.setup(config)
+            for index in range(3):
+                result = self.vizcal.process({'main': Frame(np.roll(image, index, axis=1), {'meta': {'id': index, 'ts': float(index)}}, 'BGR')})['main']
+                assert_native(result.data)
+            self.assertIn('Movement Distance', result.data)
+
+    def test_emit_mode_on_change(self):
+        """Test that on_change attaches metrics on a category flip, an epsilon change or the keyframe interval."""
+        config = VizcalConfig(self.config, emit_mode='on_change', emit_epsilon=0.5, emit_interval=5, show_text_overlays=False)
+        self.vizcal.setup(config)
+        image = np.zeros((120, 160, 3), dtype=np.uint8)
+
+        distances = [0.0, 0.2, 0.4, 6.0, 6.3, 6.1, 6.0, 6.2, 6.1, 6.0]
+        emitted = []
+        with patch.object(self.vizcal, 'calculate_camera_stability_metrics_per_topic') as mock_stability:
+            for distance in distances:
+                mock_stability.return_value = {"Average Shake Distance": distance, "Camera Stability Category": "Video is Stable" if distance < 5 else "Video Unstable - Camera might be Shaking"}
+                result = self.vizcal.process({'main': Frame(image, {}, 'BGR')})['main']
+                emitted.append("Average Shake Distance" in result.data)
+                self.assertIn('frame_number', result.data)
+
+        # First frame, category flip at 6.0, then the keyframe 5 frames later
+        self.assertEqual(emitted, [True, False, False, True, False, False, False, False, True, False])
+
+    def test_emit_mode_interval(self):
+        """Test that interval mode attaches metrics every emit_interval frames and validates the interval."""
+        config = VizcalConfig(self.config, emit_mode='interval', emit_interval=3, show_text_overlays=False)
+        self.vizcal.setup(config)
+        image = np.random.randint(0, 255, (120, 160, 3), dtype=np.uint8)
+
+        emitted = ["Camera Stability Category" in self.vizcal.process({'main': Frame(image, {}, 'BGR')})['main'].data for _ in range(7)]
+        self.assertEqual(emitted, [True, False, False, True, False, False, True])
+
+        with self.assertRaises(ValueError):
+            self.vizcal.normalize_config(VizcalConfig(self.config, emit_mode='interval', emit_interval=0))
+
+    def test_rolling_stats_window(self):
+        """Test that the ring buffer keeps the EMA and the mean/max of the last window values."""
+        stats = RollingStats(window=3, alpha=0.5)
+        results = [stats.update(value) for value in (4.0, 1.0, 2.0, 0.5, 0.5, 0.5)]
+
+        self.assertEqual(results[0], (4.0, 4.0, 4.0))
+        self.assertEqual(results[2], (2.25, 7.0 / 3, 4.0))
+        self.assertEqual(results[3][2], 2.0)  # 4.0 left the window
+        self.assertAlmostEqual(results[5][1], 0.5)
+        self.assertEqual(results[5][2], 0.5)
+
+    def test_stability_hysteresis(self):
+        """Test that the smoothed category enters above shake_threshold and only exits below the exit threshold."""
+        config = VizcalConfig(self.config, shake_threshold=5, shake_exit_threshold=2.0, stability_window=5, stability_ema_alpha=0.5)
+        self.vizcal.setup(config)
+        topic_state = self.vizcal.get_topic_state('main')
+
+        categories = []
+        for distance in (0.0, 12.0, 12.0, 3.0, 6.0, 3.0, 1.0, 0.0, 0.0):
+            metrics = self.vizcal.shake_metrics(topic_state, np.array([distance, 0.0]), 1.0)
+            categories.append(metrics["Camera Stability Category"] == "Video is Stable")
+
+        # EMA: 0, 6, 9, 6, 6, 4.5, 2.75, 1.375, ... A single-frame threshold would flicker on 3.0/6.0/3.0
+        self.assertEqual(categories, [True, False, False, False, False, False, False, True, True])
+        self.assertEqual(metrics["Shake Distance Window Max"], 6.0)
+        self.assertIn("Shake Distance EMA", metrics)
+
+        with self.assertRaises(ValueError):
+            self.vizcal.normalize_config(VizcalConfig(self.config, shake_threshold=5, shake_exit_threshold=6.0))
+
     def test_non_image_frame_forwarding(self):
         """Test that non-image frames are forwarded as-is."""
         self.vizcal.setup(self.config)
@@ -1,8 +1,15 @@
-import logging, sys, os, json, cv2
+import logging, sys, os, json, time, cv2
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from openfilter.filter_runtime.filter import FilterConfig, Filter, Frame
-from vizcal.vizcal_utils.video_properties import calc_video_properties, detect_camera_shake, text_on_image, flag_stability, KEYS_TO_INCLUDE
+from vizcal.vizcal_utils.video_properties import probe_video_properties_async, StreamPropertiesEstimator, frame_resolution, detect_camera_shake, crop_to_roi, analysis_size, downscale_for_analysis, StabilityEngine, DenseFlowEngine, summarize_flow, track_points_lk, replenish_points, OverlayCompositor
 from vizcal.vizcal_utils.utils import convert_dict_to_serializable
+from vizcal.vizcal_utils.sharding import ShardPool
+from vizcal.vizcal_utils.scheduler import AnalysisScheduler
+from vizcal.vizcal_utils.reporter import MetricsReporter
+from vizcal.vizcal_utils.timing import add_timing, StageTimings, STAGE_TIMING_KEY
+from vizcal.vizcal_utils.exporter import MetricsExporter
+from vizcal.vizcal_utils.smoothing import RollingStats
 
 # Expose VizcalConfig and Vizcal to external modules
 __all__ = ['VizcalConfig', 'Vizcal']
@@ -16,14 +23,44 @@ class VizcalConfig(FilterConfig):
     calculate_video_properties: bool = True
     calculate_movement:         bool = True
     
+    # Video properties settings
+    stream_properties_window:   int = 30  # Frames in the rolling window for effective FPS and jitter
+    static_properties_interval: int = 1   # Resend constant video properties every N frames, 0 = only when they change
+    
+    # Metrics emission: 'every_frame', 'on_change' (category flip, numeric change > epsilon, or keyframe) or 'interval'
+    emit_mode:                  str = 'every_frame'
+    emit_epsilon:               float = 0.5  # Absolute change of a numeric metric that counts as a change
+    emit_interval:              int = 30     # Keyframe interval in frames: metrics are always attached this often, 0 disables for on_change
+    
     # Camera stability settings
     shake_threshold:            int = 5
+    orb_nfeatures:              int = 500    # Max ORB keypoints per frame
+    orb_scale_factor:           float = 1.2  # ORB pyramid decimation ratio
+    orb_nlevels:                int = 8      # ORB pyramid levels
+    orb_fast_threshold:         int = 20     # FAST corner threshold used by ORB
+    shake_max_matches:          int = 0      # Best matches kept for the shake estimate, 0 keeps all
+    shake_keyframe_interval:    int = 1      # Full ORB matching every N frames, 1 = every frame
+    shake_keyframe_mode:        str = 'track'  # Between keyframes: 'track' (sparse LK) or 'hold' (repeat last metrics)
+    shake_keyframe_max_drift:   float = 0.0  # Force a keyframe once tracked drift exceeds this many pixels, 0 disables
+    stability_window:           int = 0      # Frames in the rolling shake statistics, 0 classifies single frames
+    stability_ema_alpha:        float = 0.3  # EMA weight of the newest shake distance
+    shake_exit_threshold:       float = 0.0  # Smoothed distance below which an unstable camera is stable again, 0 = shake_threshold
     
     # Movement detection settings  
     movement_threshold:         float = 1.0
+    movement_target_points:     int = 100    # Tracked points kept topped up by grid-bucketed detection
+    movement_grid:              int = 4      # Detection grid is N x N cells
+    movement_fb_threshold:      float = 1.0  # Forward-backward LK error in pixels to keep a point, 0 disables
+    movement_method:            str = 'lk'   # 'lk' (sparse corners), 'dis' or 'farneback' (dense flow)
+    dense_flow_max_width:       int = 160    # Width dense flow is computed at
+    
+    # Analysis resolution (shake and movement run on a downscaled grayscale image)
+    analysis_scale:             float = 1.0  # Downscale factor in (0, 1], 1.0 keeps full resolution
+    analysis_max_width:         int = 0      # Cap on analysis image width in pixels, 0 disables
     
     # ROI for analysis (optional)
     roi:                        list[int] = []
+    topic_rois:                 dict[str, list[int]] = {}  # Per-topic ROI overrides, e.g. {"main": [x, y, w, h]}
     
     # Data forwarding
     forward_upstream_data:      bool = True  # Forward data from upstream filters
@@ -32,7 +69,27 @@ class VizcalConfig(FilterConfig):
     show_text_overlays:         bool = True  # Show text overlays on video frames
     
     # Output settings
-    log_interval:               int = 3  # Log every N frames
+    log_interval:               int = 300  # Log one aggregated summary per topic every N frames, 0 disables
+    
+    # Stage timing (per-topic rolling p50/p95/p99 latency of each processing stage)
+    stage_timing:               bool = False
+    stage_timing_window:        int = 512    # Samples kept per stage histogram
+    stage_timing_in_data:       bool = False  # Also publish the summary in frame data under '_vizcal_timing'
+    
+    # Prometheus-style metrics export (per-topic counters, gauges and stage latency histograms)
+    metrics_port:               int = 0      # Serve metrics over HTTP on this port, 0 disables
+    metrics_host:               str = '0.0.0.0'
+    metrics_textfile:           str = ''     # Periodically write metrics to this text-file collector path
+    metrics_textfile_interval:  float = 5.0  # Seconds between text file writes
+    
+    # Adaptive scheduling (skip analysis of some frames under load, forwarding stale metrics)
+    adaptive_scheduling:        bool = False
+    scheduler_target_load:      float = 0.8  # Fraction of the frame interval budget analysis may use
+    scheduler_max_stride:       int = 8      # Analyze at least every N-th frame of each topic
+    
+    # Parallelism
+    topic_workers:              int = 0  # Threads used to analyze topics concurrently, 0 or 1 = sequential
+    topic_processes:            int = 0  # Worker processes topics are sharded across, 0 or 1 = in-process
     
 
 class Vizcal(Filter):
@@ -46,7 +103,7 @@ class Vizcal(Filter):
         config = VizcalConfig(super().normalize_config(config))
         
         # Convert string booleans to actual booleans
-        bool_fields = ['calculate_camera_stability', 'calculate_video_properties', 'calculate_movement', 'forward_upstream_data', 'show_text_overlays']
+        bool_fields = ['calculate_camera_stability', 'calculate_video_properties', 'calculate_movement', 'forward_upstream_data', 'show_text_overlays', 'adaptive_scheduling', 'stage_timing', 'stage_timing_in_data']
         for field in bool_fields:
             if hasattr(config, field) and isinstance(getattr(config, field), str):
                 setattr(config, field, getattr(config, field).lower() == 'true')
@@ -56,8 +113,67 @@ class Vizcal(Filter):
             config.shake_threshold = int(config.shake_threshold)
         if isinstance(config.movement_threshold, str):
             config.movement_threshold = float(config.movement_threshold)
+        for field in ['movement_target_points', 'movement_grid']:
+            if isinstance(getattr(config, field), str):
+                setattr(config, field, int(getattr(config, field)))
+        if isinstance(config.movement_fb_threshold, str):
+            config.movement_fb_threshold = float(config.movement_fb_threshold)
+        if isinstance(config.dense_flow_max_width, str):
+            config.dense_flow_max_width = int(config.dense_flow_max_width)
+        if config.movement_method not in ('lk', 'dis', 'farneback'):
+            raise ValueError(f"movement_method must be 'lk', 'dis' or 'farneback', got {config.movement_method!r}")
+        for field in ['orb_nfeatures', 'orb_nlevels', 'orb_fast_threshold', 'shake_max_matches', 'shake_keyframe_interval']:
+            if isinstance(getattr(config, field), str):
+                setattr(config, field, int(getattr(config, field)))
+        if isinstance(config.shake_keyframe_max_drift, str):
+            config.shake_keyframe_max_drift = float(config.shake_keyframe_max_drift)
+        if isinstance(config.stability_window, str):
+            config.stability_window = int(config.stability_window)
+        for field in ['stability_ema_alpha', 'shake_exit_threshold']:
+            if isinstance(getattr(config, field), str):
+                setattr(config, field, float(getattr(config, field)))
+        if config.shake_threshold is not None and config.shake_exit_threshold > config.shake_threshold:
+            raise ValueError(f"shake_exit_threshold ({config.shake_exit_threshold}) must not exceed shake_threshold ({config.shake_threshold})")
+        if config.shake_keyframe_mode not in ('track', 'hold'):
+            raise ValueError(f"shake_keyframe_mode must be 'track' or 'hold', got {config.shake_keyframe_mode!r}")
+        if isinstance(config.orb_scale_factor, str):
+            config.orb_scale_factor = float(config.orb_scale_factor)
+        if isinstance(config.analysis_scale, str):
+            config.analysis_scale = float(config.analysis_scale)
+        if isinstance(config.analysis_max_width, str):
+            config.analysis_max_width = int(config.analysis_max_width)
         if isinstance(config.log_interval, str):
             config.log_interval = int(config.log_interval)
+        if isinstance(config.stage_timing_window, str):
+            config.stage_timing_window = int(config.stage_timing_window)
+        if isinstance(config.metrics_port, str):
+            config.metrics_port = int(config.metrics_port)
+        if isinstance(config.metrics_textfile_interval, str):
+            config.metrics_textfile_interval = float(config.metrics_textfile_interval)
+        if isinstance(config.stream_properties_window, str):
+            config.stream_properties_window = int(config.stream_properties_window)
+        if isinstance(config.static_properties_interval, str):
+            config.static_properties_interval = int(config.static_properties_interval)
+        if isinstance(config.emit_epsilon, str):
+            config.emit_epsilon = float(config.emit_epsilon)
+        if isinstance(config.emit_interval, str):
+            config.emit_interval = int(config.emit_interval)
+        if config.emit_mode not in ('every_frame', 'on_change', 'interval'):
+            raise ValueError(f"emit_mode must be 'every_frame', 'on_change' or 'interval', got {config.emit_mode!r}")
+        if config.emit_mode == 'interval' and config.emit_interval < 1:
+            raise ValueError(f"emit_interval must be at least 1 with emit_mode 'interval', got {config.emit_interval}")
+        if isinstance(config.scheduler_target_load, str):
+            config.scheduler_target_load = float(config.scheduler_target_load)
+        if isinstance(config.scheduler_max_stride, str):
+            config.scheduler_max_stride = int(config.scheduler_max_stride)
+        if isinstance(config.topic_workers, str):
+            config.topic_workers = int(config.topic_workers)
+        if isinstance(config.topic_processes, str):
+            config.topic_processes = int(config.topic_processes)
+        if isinstance(config.roi, str):
+            config.roi = json.loads(config.roi)
+        if isinstance(config.topic_rois, str):
+            config.topic_rois = json.loads(config.topic_rois)
         
         logger.info(f"VizCal configuration: {config}")
         return config
@@ -82,9 +198,30 @@ class Vizcal(Filter):
         
         # Set other configuration attributes
         self.shake_threshold = config.shake_threshold
+        self.shake_keyframe_interval = max(1, config.shake_keyframe_interval)
+        self.shake_keyframe_mode = config.shake_keyframe_mode
+        self.shake_keyframe_max_drift = config.shake_keyframe_max_drift
+        self.stability_window = config.stability_window
+        self.stability_ema_alpha = config.stability_ema_alpha
+        self.shake_exit_threshold = config.shake_exit_threshold or config.shake_threshold
+        self.orb_params = dict(
+            nfeatures=config.orb_nfeatures,
+            scale_factor=config.orb_scale_factor,
+            nlevels=config.orb_nlevels,
+            fast_threshold=config.orb_fast_threshold,
+            max_matches=config.shake_max_matches,
+        )
         self.movement_threshold = config.movement_threshold
+        self.analysis_scale = config.analysis_scale
+        self.analysis_max_width = config.analysis_max_width
         self.roi = config.roi
+        self.topic_rois = config.topic_rois or {}
         self.forward_upstream_data = config.forward_upstream_data
+        self.stream_properties_window = config.stream_properties_window
+        self.static_properties_interval = config.static_properties_interval
+        self.emit_mode = config.emit_mode
+        self.emit_epsilon = config.emit_epsilon
+        self.emit_interval = config.emit_interval
         self.show_text_overlays = config.show_text_overlays
         
         # Initialize per-topic state tracking
@@ -100,14 +237,41 @@ class Vizcal(Filter):
             self.old_gray = None
             self.p0 = None
             self.feature_params = dict(maxCorners=100, qualityLevel=0.3, minDistance=7, blockSize=7)
+            self.movement_target_points = config.movement_target_points
+            self.movement_grid = max(1, config.movement_grid)
+            self.movement_fb_threshold = config.movement_fb_threshold
+            self.movement_method = config.movement_method
+            self.dense_flow_max_width = config.dense_flow_max_width
             self.lk_params = dict(winSize=(15, 15), maxLevel=2, criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
         
-        # Initialize video properties
-        if self.calculate_video_properties:
-            self.video_properties_calculated = False
-        
         # Output settings
         self.log_interval = config.log_interval
+        self.reporter = MetricsReporter(config.log_interval) if config.log_interval > 0 else None
+        
+        # Stage timing histograms live in each topic's state
+        self.stage_timing = config.stage_timing or config.stage_timing_in_data
+        self.stage_timing_window = config.stage_timing_window
+        self.stage_timing_in_data = config.stage_timing_in_data
+        
+        # Metrics exporter, fed by every processed topic frame
+        self.exporter = None
+        if config.metrics_port or config.metrics_textfile:
+            self.exporter = MetricsExporter(port=config.metrics_port, host=config.metrics_host, textfile=config.metrics_textfile, textfile_interval=config.metrics_textfile_interval)
+        
+        # Per-topic analysis is independent and OpenCV releases the GIL, so topics can run on a thread pool
+        self.topic_executor = None
+        if config.topic_workers > 1:
+            self.topic_executor = ThreadPoolExecutor(max_workers=config.topic_workers, thread_name_prefix='vizcal-topic')
+        
+        # Each process schedules the topics it analyzes against its own capacity
+        self.scheduler = None
+        if config.adaptive_scheduling:
+            self.scheduler = AnalysisScheduler(config.scheduler_target_load, config.scheduler_max_stride, capacity=max(1, config.topic_workers))
+        
+        # For Python-bound loads topics can instead be sharded across worker processes that own their state
+        self.shard_pool = None
+        if config.topic_processes > 1:
+            self.shard_pool = ShardPool(config.topic_processes, config)
 
     def shutdown(self):
         """
@@ -124,7 +288,7 @@ class Vizcal(Filter):
             logger.info("Camera stability analysis completed")
         
         # Log video properties if calculated
-        if self.calculate_video_properties and hasattr(self, 'video_properties_calculated') and self.video_properties_calculated:
+        if self.calculate_video_properties and any(state['video_properties'] for state in getattr(self, 'topic_states', {}).values()):
             logger.info("Video properties analysis completed")
         
         # Log movement analysis if enabled
@@ -132,6 +296,18 @@ class Vizcal(Filter):
             logger.info("Movement analysis completed")
         
         # Clean up resources
+        if getattr(self, 'topic_executor', None) is not None:
+            self.topic_executor.shutdown(wait=True)
+            self.topic_executor = None
+        
+        if getattr(self, 'shard_pool', None) is not None:
+            self.shard_pool.close()
+            self.shard_pool = None
+        
+        if getattr(self, 'exporter', None) is not None:
+            self.exporter.close()
+            self.exporter = None
+        
         if hasattr(self, 'prv_frame'):
             self.prv_frame = None
         
@@ -171,30 +347,164 @@ class Vizcal(Filter):
         
         return metrics
 
-    def calculate_video_properties_metrics(self, data):
+    def calculate_video_properties_metrics(self, data, topic_state):
         """
-        Calculates video properties metrics.
+        Calculates video properties metrics for a topic, keyed by its `meta['src']`.
+        Topics sharing a source share one probe. The source is probed in the background,
+        so this returns an empty dict until the probe has finished.
         
         Args:
             data: Frame data containing metadata
+            topic_state (dict): Per-topic state dictionary.
             
         Returns:
             dict: Video properties metrics
         """
-        if not self.calculate_video_properties or self.video_properties_calculated:
+        if not self.calculate_video_properties or topic_state['video_properties_calculated']:
             return {}
             
-        file_path = data['meta']['src'].replace('file://', '')
-        logger.info(f"Calculating video properties for: {file_path}")
+        if topic_state['video_properties_future'] is None:
+            # Only sources OpenCV can reopen are probed, stream properties cover the rest
+            src = data.get('meta', {}).get('src')
+            if not src or ('://' in src and not src.startswith(('file://', 'rtsp://', 'rtsps://'))):
+                topic_state['video_properties_calculated'] = True
+                return {}
+
+            file_path = src.replace('file://', '')
+            logger.info(f"Calculating video properties for: {file_path}")
+            topic_state['video_properties_future'] = probe_video_properties_async(file_path)
+
+        if not topic_state['video_properties_future'].done():
+            return {}
+
+        try:
+            video_properties = topic_state['video_properties_future'].result()
+        except Exception as e:
+            logger.warning(f"Video properties probe failed: {e}")
+            video_properties = {}
+
+        # Probe results are constant, so they are converted to native types once and reused for every frame
+        video_properties = convert_dict_to_serializable(dict(video_properties))
+        topic_state['video_properties'] = video_properties
+        topic_state['video_properties_calculated'] = True
+        return video_properties
+
+    def static_properties(self, data, topic_state, frame_shape):
+        """
+        Returns the topic's constant video properties (probed properties and frame resolution)
+        if they are due in this frame's payload: whenever they change, e.g. when the probe
+        finishes or the resolution switches, and otherwise every `static_properties_interval` frames.
         
-        self.video_properties = calc_video_properties(file_path)
+        Args:
+            data: Frame data containing metadata
+            topic_state (dict): Per-topic state dictionary.
+            frame_shape (tuple): Shape of the current video frame.
+            
+        Returns:
+            dict: The cached static properties (not to be modified), or None
+        """
+        if not self.calculate_video_properties:
+            return None
+
+        changed = False
+        if not topic_state['video_properties_calculated']:
+            changed = bool(self.calculate_video_properties_metrics(data, topic_state))
+        if topic_state['frame_shape'] != frame_shape[:2]:
+            topic_state['frame_shape'] = frame_shape[:2]
+            changed = True
+        if changed:
+            # The frame's own resolution takes precedence over the probed one
+            topic_state['static_properties'] = {**topic_state['video_properties'], **frame_resolution(frame_shape)}
+            topic_state['video_properties_sent'] = None
+
+        last_sent = topic_state['video_properties_sent']
+        if last_sent is not None and (self.static_properties_interval <= 0 or topic_state['frame_count'] - last_sent < self.static_properties_interval):
+            return None
+
+        topic_state['video_properties_sent'] = topic_state['frame_count']
+        return topic_state['static_properties']
+
+    def metrics_due(self, topic_state, metrics):
+        """
+        Decides whether this frame's stability and movement metrics are attached to the payload,
+        remembering them as the last emitted metrics if so.
         
-        # Set ROI if not specified
-        if not self.roi:
-            self.roi = [0, 0, self.video_properties['Frame Width'], self.video_properties['Frame Height']]
+        Args:
+            topic_state (dict): Per-topic state dictionary.
+            metrics (dict): The frame's stability and movement metrics.
+            
+        Returns:
+            bool: True if the metrics are emitted with this frame
+        """
+        last_emitted = topic_state['emitted_metrics']
+        due = (
+            last_emitted is None or
+            (self.emit_interval > 0 and topic_state['frame_count'] - topic_state['emitted_frame'] >= self.emit_interval) or
+            (self.emit_mode == 'on_change' and self.metrics_changed(last_emitted, metrics))
+        )
+
+        if due:
+            topic_state['emitted_metrics'] = metrics
+            topic_state['emitted_frame'] = topic_state['frame_count']
+        return due
+
+    def metrics_changed(self, previous, metrics):
+        """
+        Compares metrics with the last emitted ones: numeric values must move by more than
+        `emit_epsilon`, any other value (categories, flags) by any change.
         
-        self.video_properties_calculated = True
-        return self.video_properties
+        Args:
+            previous (dict): The last emitted metrics.
+            metrics (dict): The current metrics.
+            
+        Returns:
+            bool: True if the metrics changed
+        """
+        if previous.keys() != metrics.keys():
+            return True
+
+        for key, value in metrics.items():
+            if type(value) in (int, float) and type(previous[key]) in (int, float):
+                if abs(value - previous[key]) > self.emit_epsilon:
+                    return True
+            elif value != previous[key]:
+                return True
+
+        return False
+
+    def calculate_stream_properties_metrics(self, image, data, topic_state):
+        """
+        Calculates rolling frame-derived stream properties (effective FPS, jitter and
+        megapixels/s) without any I/O on the source.
+        
+        Args:
+            image (numpy.ndarray): The current video frame.
+            data: Frame data containing metadata
+            topic_state (dict): Per-topic state dictionary.
+            
+        Returns:
+            dict: Stream properties metrics
+        """
+        if not self.calculate_video_properties:
+            return {}
+
+        if topic_state.get('stream_properties') is None:
+            topic_state['stream_properties'] = StreamPropertiesEstimator(self.stream_properties_window)
+
+        return topic_state['stream_properties'].update(image.shape, self.frame_timestamp(data))
+
+    def frame_timestamp(self, data):
+        """
+        Returns the timestamp of a frame: the upstream read time, else the arrival time.
+
+        Args:
+            data: Frame data containing metadata
+
+        Returns:
+            float: Timestamp in seconds.
+        """
+        timestamp = data.get('meta', {}).get('ts')
+        return time.time() if timestamp is None else timestamp
 
     def calculate_movement_metrics(self, frame):
         """
@@ -240,79 +550,511 @@ class Vizcal(Filter):
         
         return {"Movement Distance": 0.0, "Movement Detected": False}
 
-    def calculate_camera_stability_metrics_per_topic(self, frame, topic_state):
+    def get_topic_roi(self, topic_name):
+        """
+        Returns the analysis ROI of a topic: its `topic_rois` entry, else the global `roi`.
+
+        Args:
+            topic_name (str): Name of the topic.
+
+        Returns:
+            list[int]: ROI as [x, y, width, height], empty for the whole frame.
+        """
+        return self.topic_rois.get(topic_name, self.roi)
+
+    def gray_buffer(self, topic_state, name, shape, double=True):
+        """
+        Returns a preallocated per-topic grayscale buffer, reallocated only when the shape changes.
+
+        Double buffers never hand out a buffer still kept as a previous image (`old_gray`,
+        `shake_prev_gray`), so previous images stay valid without copying. Normally two buffers
+        alternate; a third is only added when a failed analysis left both of them referenced.
+
+        Args:
+            topic_state (dict): Per-topic state dictionary.
+            name (str): Buffer name.
+            shape (tuple): Required (height, width).
+            double (bool): Whether to avoid buffers kept as previous images.
+
+        Returns:
+            numpy.ndarray: The buffer to write this frame's image into.
+        """
+        buffers = topic_state.setdefault('gray_buffers', {})
+        pool = buffers.get(name)
+        if pool is None or pool[0].shape != tuple(shape):
+            pool = buffers[name] = [np.empty(shape, dtype=np.uint8)]
+        if not double:
+            return pool[0]
+
+        kept = [image for image in (topic_state.get('old_gray'), topic_state.get('shake_prev_gray')) if image is not None]
+        for buffer in pool:
+            if not any(np.may_share_memory(buffer, image) for image in kept):
+                return buffer
+
+        pool.append(np.empty(shape, dtype=np.uint8))
+        return pool[-1]
+
+    def preprocess_frame(self, frame, roi=None, topic_state=None):
+        """
+        Computes the per-frame images shared by all analyzers, so each frame is
+        cropped, converted to grayscale (and downscaled) only once.
+
+        Args:
+            frame (numpy.ndarray): The current BGR video frame.
+            roi (list[int], optional): Region [x, y, width, height] to restrict analysis to.
+            topic_state (dict, optional): Per-topic state whose preallocated buffers receive the images.
+
+        Returns:
+            dict: ROI 'gray', downscaled 'analysis_gray' and its 'scale'.
+        """
+        # Cropping is a view, so conversion and analysis cost scale with the ROI area
+        cropped = crop_to_roi(frame, roi)
+        if topic_state is None:
+            gray = cv2.cvtColor(cropped, cv2.COLOR_BGR2GRAY)
+            analysis_gray, scale = downscale_for_analysis(gray, self.analysis_scale, self.analysis_max_width)
+            return {'gray': gray, 'analysis_gray': analysis_gray, 'scale': scale}
+
+        # The analysis image is kept as the previous frame, so it is double buffered. When it is
+        # downscaled the full gray image is scratch and only needs a single buffer.
+        scale, (width, height) = analysis_size(cropped.shape, self.analysis_scale, self.analysis_max_width)
+        gray = cv2.cvtColor(cropped, cv2.COLOR_BGR2GRAY, dst=self.gray_buffer(topic_state, 'gray', cropped.shape[:2], double=scale == 1.0))
+        dst = self.gray_buffer(topic_state, 'analysis_gray', (height, width)) if scale < 1.0 else None
+        analysis_gray, scale = downscale_for_analysis(gray, self.analysis_scale, self.analysis_max_width, dst=dst)
+        return {'gray': gray, 'analysis_gray': analysis_gray, 'scale': scale}
+
+    def calculate_camera_stability_metrics_per_topic(self, frame, topic_state, analysis=None):
         """
         Calculates camera stability metrics for the current frame using per-topic state.
 
         Args:
             frame (numpy.ndarray): The current video frame.
             topic_state (dict): Per-topic state dictionary.
+            analysis (dict, optional): Shared preprocessing output from `preprocess_frame`.
 
         Returns:
             dict: A dictionary with camera stability metrics.
         """
         if not self.calculate_camera_stability:
             return {}
+        if analysis is None:
+            analysis = self.preprocess_frame(frame)
             
-        shaky_bool = False
-        avg_distance = 0
-        if topic_state['prv_frame'] is not None:
-            avg_distance, shaky_bool = detect_camera_shake(topic_state['prv_frame'], frame, self.shake_threshold)
-        
-        stability_category = "Video Unstable - Camera might be Shaking" if shaky_bool else "Video is Stable"
-        topic_state['prv_frame'] = frame
+        # Detector and matcher live for the topic's lifetime instead of being rebuilt per frame
+        if topic_state.get('stability_engine') is None:
+            topic_state['stability_engine'] = StabilityEngine(**self.orb_params)
+        engine = topic_state['stability_engine']
+        gray, scale = analysis['analysis_gray'], analysis['scale']
+        timings = topic_state.get('frame_timings')
 
-        metrics = {
-            "Average Shake Distance": round(float(avg_distance), 2),
-            "Camera Stability Category": stability_category
-        }
+        # First frame becomes the reference keyframe, as does the first frame after a frame size or ROI
+        # change since neither the keyframe's features nor its tracking image can be compared to it
+        if topic_state['orb_features'] is None or topic_state['keyframe_shape'] != gray.shape:
+            self.set_shake_keyframe(topic_state, engine.extract(gray, timings), gray)
+            return self.shake_metrics(topic_state, None, scale)
+
+        topic_state['frames_since_keyframe'] += 1
+        drift = float(np.linalg.norm(topic_state['keyframe_offset'])) / scale
+        need_keyframe = (
+            topic_state['frames_since_keyframe'] >= self.shake_keyframe_interval or
+            (self.shake_keyframe_max_drift > 0 and drift > self.shake_keyframe_max_drift)
+        )
+
+        if not need_keyframe and self.shake_keyframe_mode == 'hold':
+            return dict(topic_state['stability_metrics'])
+
+        # Frames the step below spans: frames skipped by the scheduler or lost to errors since the
+        # last measured frame are divided out. In 'hold' mode a keyframe step spans the whole interval.
+        frames = topic_state.get('frame_count', 0) - topic_state.get('offset_frame', 0)
+        if self.shake_keyframe_mode == 'hold':
+            frames = max(frames, topic_state['frames_since_keyframe'])
+        frames = max(1, frames)
+
+        if not need_keyframe:
+            # Between keyframes only the keyframe's points are tracked with sparse LK
+            step, tracked_points = engine.track(topic_state['shake_prev_gray'], gray, topic_state['tracked_points'], timings)
+            if step is not None:
+                topic_state['keyframe_offset'] = topic_state['keyframe_offset'] + step
+                topic_state['offset_frame'] = topic_state.get('frame_count', 0)
+                topic_state['tracked_points'] = tracked_points
+                topic_state['shake_prev_gray'] = gray
+                return self.shake_metrics(topic_state, step, scale, frames)
+
+        # Full ORB matching against the reference keyframe. Features of the current frame are
+        # cached and become the next reference, so each frame is only described once.
+        curr_features = engine.extract(gray, timings)
+        step = engine.translation(topic_state['orb_features'], curr_features, timings)
+        if step is not None and self.shake_keyframe_mode == 'track':
+            # Tracking already accounted for the displacement up to the last tracked frame
+            step = step - topic_state['keyframe_offset']
+        self.set_shake_keyframe(topic_state, curr_features, gray)
+
+        return self.shake_metrics(topic_state, step, scale, frames)
+
+    def set_shake_keyframe(self, topic_state, features, gray):
+        """
+        Makes the current frame the reference keyframe for shake estimation.
+
+        Args:
+            topic_state (dict): Per-topic state dictionary.
+            features (tuple): ORB `(points, descriptors)` of the current frame.
+            gray (numpy.ndarray): Analysis grayscale image of the current frame.
+        """
+        topic_state['orb_features'] = features
+        topic_state['keyframe_shape'] = gray.shape
+        topic_state['frames_since_keyframe'] = 0
+        topic_state['keyframe_offset'] = np.zeros(2)
+        topic_state['offset_frame'] = topic_state.get('frame_count', 0)
+        if self.shake_keyframe_interval > 1 and self.shake_keyframe_mode == 'track':
+            topic_state['tracked_points'] = features[0]
+            topic_state['shake_prev_gray'] = gray
+
+    def shake_metrics(self, topic_state, translation, scale, frames=1):
+        """
+        Builds camera stability metrics from a translation and keeps them as the topic's
+        last known metrics.
+
+        Args:
+            topic_state (dict): Per-topic state dictionary.
+            translation (numpy.ndarray): (dx, dy) in analysis pixels, None if unknown.
+            scale (float): Analysis downscale factor.
+            frames (int): Number of frames the translation spans.
+
+        Returns:
+            dict: A dictionary with camera stability metrics.
+        """
+        # Distance is reported per frame in full-resolution pixels
+        avg_distance = 0.0 if translation is None else float(np.linalg.norm(translation)) / (scale * frames)
+        metrics = {"Average Shake Distance": round(avg_distance, 2)}
+
+        if self.stability_window > 0:
+            # The smoothed distance drives the category, with a hysteresis band against flicker
+            if topic_state.get('stability_stats') is None:
+                topic_state['stability_stats'] = RollingStats(self.stability_window, self.stability_ema_alpha)
+            ema, window_mean, window_max = topic_state['stability_stats'].update(avg_distance)
+            threshold = self.shake_exit_threshold if topic_state['camera_unstable'] else self.shake_threshold
+            shaky_bool = ema >= threshold if topic_state['camera_unstable'] else ema > threshold
+            topic_state['camera_unstable'] = shaky_bool
+            metrics.update({
+                "Shake Distance EMA": round(ema, 2),
+                "Shake Distance Window Mean": round(window_mean, 2),
+                "Shake Distance Window Max": round(window_max, 2),
+            })
+        else:
+            shaky_bool = avg_distance > self.shake_threshold
+
+        metrics["Camera Stability Category"] = "Video Unstable - Camera might be Shaking" if shaky_bool else "Video is Stable"
+        topic_state['stability_metrics'] = metrics
         
-        return metrics
+        return dict(metrics)
 
-    def calculate_movement_metrics_per_topic(self, frame, topic_state):
+    def calculate_movement_metrics_per_topic(self, frame, topic_state, analysis=None):
         """
         Calculates movement metrics for the current frame using per-topic state.
         
         Args:
             frame (numpy.ndarray): The current video frame.
             topic_state (dict): Per-topic state dictionary.
+            analysis (dict, optional): Shared preprocessing output from `preprocess_frame`.
             
         Returns:
             dict: Movement metrics
         """
         if not self.calculate_movement:
             return {}
+        if analysis is None:
+            analysis = self.preprocess_frame(frame)
             
-        # Convert to grayscale for optical flow
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        # Optical flow runs on the shared (optionally downscaled) grayscale image
+        gray, scale = analysis['analysis_gray'], analysis['scale']
+        timings = topic_state.get('frame_timings')
+        if self.movement_method != 'lk':
+            return self.calculate_dense_movement_metrics(gray, scale, topic_state)
+        if topic_state.get('cell_retry') is None:
+            topic_state['cell_retry'] = np.zeros((self.movement_grid, self.movement_grid), dtype=np.int32)
+
+        metrics = {"Movement Distance": 0.0, "Movement Detected": False}
+        old_gray, p0 = topic_state['old_gray'], topic_state['p0']
+        # Movement is reported per frame even when frames since the previous image were not analyzed
+        frames = max(1, topic_state.get('frame_count', 0) - topic_state.get('old_gray_frame', 0))
         
-        if topic_state['old_gray'] is not None:
-            # Calculate optical flow
-            p1, st, err = cv2.calcOpticalFlowPyrLK(topic_state['old_gray'], gray, topic_state['p0'], None, **self.lk_params)
+        if old_gray is not None and old_gray.shape == gray.shape and p0 is not None and len(p0):
+            # Calculate optical flow, dropping points that fail the forward-backward check
+            start = time.perf_counter()
+            good_old, good_new = track_points_lk(old_gray, gray, p0, self.lk_params, self.movement_fb_threshold)
+            add_timing(timings, 'lk', start)
             
-            if p1 is not None and st is not None:
-                # Select good points
-                good_new = p1[st == 1]
-                good_old = topic_state['p0'][st == 1]
-                
-                if len(good_new) > 0 and len(good_old) > 0:
-                    # Calculate movement distances
-                    distances = np.linalg.norm(good_new - good_old, axis=1)
-                    avg_movement = float(np.mean(distances))
-                    
-                    # Update points for next frame
-                    topic_state['p0'] = good_new.reshape(-1, 1, 2)
-                    
-                    return {
-                        "Movement Distance": round(avg_movement, 2),
-                        "Movement Detected": avg_movement > self.movement_threshold
-                    }
+            if len(good_new) > 0:
+                # Calculate movement distances in full-resolution pixels
+                distances = np.linalg.norm(good_new - good_old, axis=1) / (scale * frames)
+                avg_movement = float(np.mean(distances))
+                metrics = {
+                    "Movement Distance": round(avg_movement, 2),
+                    "Movement Detected": avg_movement > self.movement_threshold
+                }
+            
+            p0 = good_new.reshape(-1, 1, 2)
+        else:
+            p0 = None
         
-        # Initialize for first frame
-        topic_state['p0'] = cv2.goodFeaturesToTrack(gray, mask=None, **self.feature_params)
-        topic_state['old_gray'] = gray.copy()
+        # Top up points only in cells that lost their features, keeping a steady point count
+        start = time.perf_counter()
+        topic_state['p0'] = replenish_points(gray, p0, self.feature_params, self.movement_target_points, self.movement_grid, topic_state['cell_retry'])
+        add_timing(timings, 'features', start)
+        # The analysis image lives in the topic's double buffer, so it stays valid for the next frame without a copy
+        topic_state['old_gray'] = gray
+        topic_state['old_gray_frame'] = topic_state.get('frame_count', 0)
         
-        return {"Movement Distance": 0.0, "Movement Detected": False}
+        return metrics
+
+    def calculate_dense_movement_metrics(self, gray, scale, topic_state):
+        """
+        Calculates movement metrics with a dense optical flow backend (DIS or Farneback).
+        Cost is constant per frame and does not depend on scene texture.
+
+        Args:
+            gray (numpy.ndarray): Analysis grayscale image of the current frame.
+            scale (float): Analysis downscale factor.
+            topic_state (dict): Per-topic state dictionary.
+
+        Returns:
+            dict: Movement metrics, including the global motion vector and moving pixel fraction
+        """
+        if topic_state.get('dense_flow') is None:
+            topic_state['dense_flow'] = DenseFlowEngine(self.movement_method, self.dense_flow_max_width)
+
+        start = time.perf_counter()
+        flow, flow_scale = topic_state['dense_flow'].update(gray)
+        add_timing(topic_state.get('frame_timings'), 'dense_flow', start)
+        frames = max(1, topic_state.get('frame_count', 0) - topic_state.get('old_gray_frame', 0))
+        topic_state['old_gray_frame'] = topic_state.get('frame_count', 0)
+        if flow is None:
+            return {"Movement Distance": 0.0, "Movement Detected": False, "Global Motion X": 0.0, "Global Motion Y": 0.0, "Moving Pixel Fraction": 0.0}
+
+        avg_movement, global_motion, moving_fraction = summarize_flow(flow, scale * flow_scale * frames, self.movement_threshold)
+        return {
+            "Movement Distance": round(avg_movement, 2),
+            "Movement Detected": avg_movement > self.movement_threshold,
+            "Global Motion X": round(float(global_motion[0]), 2),
+            "Global Motion Y": round(float(global_motion[1]), 2),
+            "Moving Pixel Fraction": round(moving_fraction, 4),
+        }
+
+    def get_topic_state(self, topic_name):
+        """
+        Returns the state of a topic, initializing it on first use.
+
+        Args:
+            topic_name (str): Name of the topic.
+
+        Returns:
+            dict: Per-topic state dictionary.
+        """
+        if topic_name not in self.topic_states:
+            self.topic_states[topic_name] = {
+                'orb_features': None,
+                'keyframe_shape': None,
+                'stability_engine': None,
+                'frames_since_keyframe': 0,
+                'keyframe_offset': None,
+                'offset_frame': 0,
+                'tracked_points': None,
+                'shake_prev_gray': None,
+                'stability_metrics': None,
+                'stability_stats': None,
+                'camera_unstable': False,
+                'old_gray': None,
+                'old_gray_frame': 0,
+                'p0': None,
+                'cell_retry': None,
+                'gray_buffers': {},
+                'dense_flow': None,
+                'overlay': None,
+                'stage_timings': StageTimings(self.stage_timing_window) if self.stage_timing else None,
+                'frame_timings': None,
+                'video_properties_calculated': False,
+                'video_properties_future': None,
+                'video_properties': {},
+                'video_properties_sent': None,
+                'frame_shape': None,
+                'static_properties': None,
+                'emitted_metrics': None,
+                'emitted_frame': 0,
+                'stream_properties': None,
+                'last_metrics': ({}, {}),
+                'frame_count': 0
+            }
+
+        return self.topic_states[topic_name]
+
+    def process_topics_sharded(self, frames, image_topics):
+        """
+        Analyzes image topics on the shard worker processes.
+
+        Args:
+            frames (dict[str, Frame]): Incoming frames by topic.
+            image_topics (list[str]): Image topics to analyze, in output order.
+
+        Returns:
+            list[Frame]: Output frames in the order of `image_topics`.
+        """
+        items = [(topic_name, frames[topic_name].image, frames[topic_name].data) for topic_name in image_topics]
+        drawn = self.show_text_overlays and self.calculate_camera_stability
+        
+        output = []
+        for topic_name, (data, image) in zip(image_topics, self.shard_pool.process(items)):
+            # Overlays were drawn into shared memory, otherwise the original pixels are unchanged
+            if drawn:
+                output.append(Frame(image.copy(), data, format='BGR'))
+            else:
+                output.append(Frame(frames[topic_name], data))
+            
+            # Workers do not export, their frame data still carries the counters and gauges
+            if self.exporter is not None:
+                error = bool(data.get("Analysis Error"))
+                self.exporter.observe(topic_name, data, analyzed=error or not data.get("Metrics Stale"), error=error)
+
+        return output
+
+    def analyze_frame(self, topic_name, image, topic_state, timings):
+        """
+        Runs the configured analyzers on a topic's frame and keeps their metrics as the
+        topic's last known metrics.
+
+        Args:
+            topic_name (str): Name of the topic the frame arrived on.
+            image (numpy.ndarray): The current BGR video frame.
+            topic_state (dict): Per-topic state dictionary.
+            timings (dict): This frame's stage timings.
+
+        Returns:
+            tuple: Camera stability metrics and movement metrics.
+        """
+        start = time.perf_counter()
+
+        # Shared preprocessing: one grayscale conversion per frame feeds every analyzer
+        analysis = None
+        if self.calculate_camera_stability or self.calculate_movement:
+            analysis = self.preprocess_frame(image, self.get_topic_roi(topic_name), topic_state)
+        stage_start = add_timing(timings, 'grayscale', start)
+
+        # Calculate camera stability metrics (per-topic)
+        stability_metrics = self.calculate_camera_stability_metrics_per_topic(image, topic_state, analysis)
+        stage_start = add_timing(timings, 'stability', stage_start)
+
+        # Calculate movement metrics (per-topic)
+        movement_metrics = self.calculate_movement_metrics_per_topic(image, topic_state, analysis)
+        add_timing(timings, 'movement', stage_start)
+        add_timing(timings, 'analysis', start)
+
+        topic_state['last_metrics'] = (stability_metrics, movement_metrics)
+        if self.scheduler is not None:
+            self.scheduler.record(topic_name, timings['analysis'])
+
+        return stability_metrics, movement_metrics
+
+    def process_topic(self, topic_name, frame, topic_state):
+        """
+        Calculates the configured metrics for a single topic's image frame.
+
+        Args:
+            topic_name (str): Name of the topic the frame arrived on.
+            frame (Frame): The incoming image frame.
+            topic_state (dict): Per-topic state dictionary.
+
+        Returns:
+            Frame: The output frame for the topic.
+        """
+        # Stages add their elapsed time to this frame's timings
+        frame_start = time.perf_counter()
+        timings = topic_state['frame_timings'] = {}
+        
+        # Analysis only reads pixels, a writable copy is taken only if overlays get drawn
+        image = frame.image
+        data = frame.data
+
+        # Initialize frame data
+        frame_data = {
+            "frame_number": topic_state['frame_count'],
+            "meta": data.get('meta', {}),
+        }
+
+        # Video properties and resolution are constant, so they are merged into the payload only when due
+        static_properties = self.static_properties(data, topic_state, image.shape)
+
+        # Rolling frame-derived stream properties work for every source type
+        stream_props = self.calculate_stream_properties_metrics(image, data, topic_state)
+        if stream_props:
+            frame_data.update(stream_props)
+
+        # Under load the scheduler may skip analysis, forwarding the last known metrics marked as stale
+        analyze = self.scheduler is None or self.scheduler.should_analyze(topic_name, self.frame_timestamp(data))
+        error = False
+        if analyze:
+            try:
+                stability_metrics, movement_metrics = self.analyze_frame(topic_name, image, topic_state, timings)
+            except Exception:
+                # A failing frame must not stop the pipeline, the topic forwards its last known metrics
+                logger.exception(f"Analysis failed for topic '{topic_name}'")
+                error = True
+                stability_metrics, movement_metrics = topic_state['last_metrics']
+        else:
+            stability_metrics, movement_metrics = topic_state['last_metrics']
+
+        if stability_metrics:
+            frame_data.update(stability_metrics)
+        if movement_metrics:
+            frame_data.update(movement_metrics)
+        if self.scheduler is not None or error:
+            frame_data["Metrics Stale"] = not analyze or error
+        if error:
+            frame_data["Analysis Error"] = True
+
+        # Add visual overlays if enabled and camera stability is being calculated
+        draw = self.config.show_text_overlays and self.calculate_camera_stability and stability_metrics
+        if draw:
+            stage_start = time.perf_counter()
+            # Static overlay parts (labels, stability lights) are cached per topic, values are drawn directly
+            if topic_state.get('overlay') is None:
+                topic_state['overlay'] = OverlayCompositor()
+            image = topic_state['overlay'].render(frame.rw.image, frame_data)
+            add_timing(timings, 'overlay', stage_start)
+        
+        # Prepare output data - include all frame data, not just filtered. Every metric is produced
+        # as a native Python type, so no serialization pass over the payload is needed.
+        stage_start = time.perf_counter()
+        payload = frame_data
+        if self.emit_mode != 'every_frame':
+            # Metrics that are not due are left out, downstream keeps the last emitted values
+            metrics = {**(stability_metrics or {}), **(movement_metrics or {})}
+            if not self.metrics_due(topic_state, metrics):
+                payload = {key: value for key, value in frame_data.items() if key not in metrics}
+        output_data = {**data, **static_properties, **payload} if static_properties else {**data, **payload}
+        if self.stage_timing_in_data:
+            # Histograms cover the topic's previous frames
+            output_data[STAGE_TIMING_KEY] = topic_state['stage_timings'].summary()
+        stage_start = add_timing(timings, 'serialize', stage_start)
+        
+        # Create output frame with the same topic name, forwarding the original image buffer when untouched
+        if not draw:
+            output_frame = Frame(frame, output_data)
+        else:
+            output_frame = Frame(image, output_data, format='BGR')
+        add_timing(timings, 'frame', stage_start)
+        add_timing(timings, 'total', frame_start)
+        
+        if topic_state['stage_timings'] is not None:
+            topic_state['stage_timings'].record(timings)
+        
+        # Fold metrics into the periodic summary instead of logging every frame
+        if self.reporter is not None:
+            self.reporter.update(topic_name, frame_data, timings, analyzed=analyze and not error)
+        if self.exporter is not None:
+            self.exporter.observe(topic_name, frame_data, timings, analyzed=analyze, error=error)
+        
+        # Update topic frame count
+        topic_state['frame_count'] += 1
+        
+        return output_frame
 
     def process(self, frames: dict[str, Frame]):
         """
@@ -321,73 +1063,40 @@ class Vizcal(Filter):
         Maintains separate state for each topic to avoid cross-contamination.
         """
         output_frames = {}
+        image_topics = []
         
-        # Process each incoming topic
+        # Collect image topics, reserving their output slot to keep the original topic order
         for topic_name, frame in frames.items():
             if not frame.has_image:
                 # Forward non-image frames as-is if upstream forwarding is enabled
                 if self.config.forward_upstream_data:
                     output_frames[topic_name] = frame
                 continue
-                
-            image = frame.rw.image
-            data = frame.rw.data
-
-            # Initialize topic state if not exists
-            if topic_name not in self.topic_states:
-                self.topic_states[topic_name] = {
-                    'prv_frame': None,
-                    'old_gray': None,
-                    'p0': None,
-                    'video_properties_calculated': False,
-                    'video_properties': {},
-                    'frame_count': 0
-                }
 
-            topic_state = self.topic_states[topic_name]
+            # Initialize topic state on the calling thread, sharded topics keep theirs in the worker
+            if self.shard_pool is None:
+                self.get_topic_state(topic_name)
 
-            # Initialize frame data
-            frame_data = {
-                "frame_number": topic_state['frame_count'],
-                "meta": data.get('meta', {}),
-            }
+            output_frames[topic_name] = None
+            image_topics.append(topic_name)
 
-            # Calculate video properties (only once per topic, but include in every frame)
-            if self.calculate_video_properties and not topic_state['video_properties_calculated']:
-                video_props = self.calculate_video_properties_metrics(data)
-                if video_props:
-                    frame_data.update(video_props)
-                    topic_state['video_properties'] = video_props
-                    topic_state['video_properties_calculated'] = True
-            elif self.calculate_video_properties and topic_state['video_properties']:
-                # Include video properties in every frame after they're calculated
-                frame_data.update(topic_state['video_properties'])
-
-            # Calculate camera stability metrics (per-topic)
-            stability_metrics = self.calculate_camera_stability_metrics_per_topic(image, topic_state)
-            if stability_metrics:
-                frame_data.update(stability_metrics)
-
-            # Calculate movement metrics (per-topic)
-            movement_metrics = self.calculate_movement_metrics_per_topic(image, topic_state)
-            if movement_metrics:
-                frame_data.update(movement_metrics)
-
-            # Add visual overlays if enabled and camera stability is being calculated
-            if self.config.show_text_overlays and self.calculate_camera_stability and stability_metrics:
-                image = text_on_image(image, frame_data)
-                image = flag_stability(image, frame_data)
-            
-            # Prepare output data - include all frame data, not just filtered
-            data_serializable = convert_dict_to_serializable(frame_data)
-            
-            # Create output frame with the same topic name
-            output_frames[topic_name] = Frame(image, {**data, **data_serializable}, format='BGR')
-            
-            # Update topic frame count
-            topic_state['frame_count'] += 1
+        # Process each image topic: on shard processes, on the thread pool when there is more than one, or inline
+        if self.shard_pool is not None:
+            results = self.process_topics_sharded(frames, image_topics) if image_topics else []
+        elif self.topic_executor is not None and len(image_topics) > 1:
+            results = self.topic_executor.map(
+                lambda topic_name: self.process_topic(topic_name, frames[topic_name], self.topic_states[topic_name]),
+                image_topics,
+            )
+        else:
+            results = (self.process_topic(topic_name, frames[topic_name], self.topic_states[topic_name]) for topic_name in image_topics)
+
+        for topic_name, output_frame in zip(image_topics, results):
+            output_frames[topic_name] = output_frame
         
         self.frame_no += 1
+        if self.exporter is not None:
+            self.exporter.tick(self.frame_no)
         
         # Ensure main topic comes first in the output dictionary
         if 'main' in output_frames:
@@ -396,6 +1105,21 @@ class Vizcal(Filter):
         
         return output_frames
 
+    def get_stats(self):
+        """
+        Returns the rolling per-stage latency of each topic analyzed in this process.
+
+        Returns:
+            dict: Topic name to `{stage: {'count', 'p50_ms', 'p95_ms', 'p99_ms'}}`, empty
+            unless stage timing is enabled. Topics sharded to worker processes are only
+            visible through the frame data key.
+        """
+        return {
+            topic_name: topic_state['stage_timings'].summary()
+            for topic_name, topic_state in list(self.topic_states.items())
+            if topic_state.get('stage_timings') is not None
+        }
+
     def get_name(self):
         """Returns the name of the filter."""
         return "Vizcal"
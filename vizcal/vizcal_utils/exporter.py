@@ -0,0 +1,177 @@
+"""
+Prometheus-style metrics export for Vizcal.
+
+Per-topic counters (frames processed, skipped, analysis errors), gauges (shake
+distance, movement distance, effective FPS) and stage latency histograms are kept
+in a small registry and rendered in the Prometheus text exposition format. They are
+served from an optional local HTTP endpoint and/or written periodically to a
+text-file collector path (e.g. for the node_exporter textfile collector).
+"""
+
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Stage latency histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+COUNTERS = {
+    'frames_processed': "Image frames processed per topic.",
+    'frames_skipped': "Frames whose analysis was skipped by the adaptive scheduler.",
+    'analysis_errors': "Frames whose analysis raised an error.",
+}
+
+# Gauge name -> (frame data key, help text)
+GAUGES = {
+    'shake_distance_pixels': ("Average Shake Distance", "Latest camera shake distance in full-resolution pixels."),
+    'movement_distance_pixels': ("Movement Distance", "Latest average movement distance in full-resolution pixels."),
+    'effective_fps': ("Effective FPS", "Effective frame rate measured from frame timestamps."),
+}
+
+
+def escape_label(value):
+    """Escape a label value for the text exposition format."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MetricsExporter:
+    """Registry of per-topic metrics with optional HTTP and text-file outputs."""
+
+    def __init__(self, prefix='vizcal', port=0, host='0.0.0.0', textfile=None, textfile_interval=5.0):
+        self.prefix = prefix
+        self.textfile = textfile or None
+        self.textfile_interval = textfile_interval
+        self.last_write = 0.0
+        self.batches = 0
+        self.topics = {}
+        self.lock = threading.Lock()
+        self.server = None
+
+        if port:
+            self.serve(host, port)
+
+    def _topic(self, topic_name):
+        topic = self.topics.get(topic_name)
+        if topic is None:
+            topic = self.topics[topic_name] = {
+                'counters': dict.fromkeys(COUNTERS, 0),
+                'gauges': {},
+                'histograms': {},  # stage -> [bucket counts..., sum, count]
+            }
+        return topic
+
+    def observe(self, topic_name, frame_data, timings=None, analyzed=True, error=False):
+        """
+        Records one processed frame of a topic.
+
+        Args:
+            topic_name (str): Topic the frame belongs to.
+            frame_data (dict): Output metrics of the frame, gauges are read from it.
+            timings (dict, optional): Stage name to elapsed seconds for this frame.
+            analyzed (bool): False when analysis was skipped by the scheduler.
+            error (bool): True when the frame's analysis raised an error.
+        """
+        with self.lock:
+            topic = self._topic(topic_name)
+            counters = topic['counters']
+            counters['frames_processed'] += 1
+            counters['frames_skipped'] += not analyzed
+            counters['analysis_errors'] += error
+
+            for gauge, (key, _) in GAUGES.items():
+                if (value := frame_data.get(key)) is not None:
+                    topic['gauges'][gauge] = float(value)
+
+            for stage, elapsed in (timings or {}).items():
+                histogram = topic['histograms'].get(stage)
+                if histogram is None:
+                    histogram = topic['histograms'][stage] = [0] * len(LATENCY_BUCKETS) + [0.0, 0]
+                for index, bound in enumerate(LATENCY_BUCKETS):
+                    if elapsed <= bound:
+                        histogram[index] += 1
+                histogram[-2] += elapsed
+                histogram[-1] += 1
+
+    def tick(self, frame_no):
+        """Called once per processed batch, writes the text file when its interval has passed."""
+        self.batches = frame_no
+        if self.textfile is not None and time.monotonic() - self.last_write >= self.textfile_interval:
+            self.write_textfile()
+
+    def render(self):
+        """Renders all metrics in the Prometheus text exposition format."""
+        prefix = self.prefix
+        with self.lock:
+            topics = sorted(self.topics.items())
+            lines = [
+                f"# HELP {prefix}_batches_total Frame batches processed by the filter.",
+                f"# TYPE {prefix}_batches_total counter",
+                f"{prefix}_batches_total {self.batches}",
+            ]
+
+            for counter, help_text in COUNTERS.items():
+                lines += [f"# HELP {prefix}_{counter}_total {help_text}", f"# TYPE {prefix}_{counter}_total counter"]
+                lines += [f'{prefix}_{counter}_total{{topic="{escape_label(name)}"}} {topic["counters"][counter]}' for name, topic in topics]
+
+            for gauge, (_, help_text) in GAUGES.items():
+                lines += [f"# HELP {prefix}_{gauge} {help_text}", f"# TYPE {prefix}_{gauge} gauge"]
+                lines += [f'{prefix}_{gauge}{{topic="{escape_label(name)}"}} {topic["gauges"][gauge]}' for name, topic in topics if gauge in topic['gauges']]
+
+            name = f"{prefix}_stage_latency_seconds"
+            lines += [f"# HELP {name} Latency of each processing stage.", f"# TYPE {name} histogram"]
+            for topic_name, topic in topics:
+                for stage, histogram in sorted(topic['histograms'].items()):
+                    labels = f'topic="{escape_label(topic_name)}",stage="{escape_label(stage)}"'
+                    lines += [f'{name}_bucket{{{labels},le="{bound}"}} {count}' for bound, count in zip(LATENCY_BUCKETS, histogram)]
+                    lines += [
+                        f'{name}_bucket{{{labels},le="+Inf"}} {histogram[-1]}',
+                        f'{name}_sum{{{labels}}} {histogram[-2]}',
+                        f'{name}_count{{{labels}}} {histogram[-1]}',
+                    ]
+
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self):
+        """Atomically writes the rendered metrics to the text-file collector path."""
+        temp_path = f"{self.textfile}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, 'w') as file:
+                file.write(self.render())
+            os.replace(temp_path, self.textfile)
+        except OSError as e:
+            logger.warning(f"Could not write metrics text file {self.textfile}: {e}")
+        self.last_write = time.monotonic()
+
+    def serve(self, host, port):
+        """Serves the metrics over HTTP from a daemon thread."""
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = exporter.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name='vizcal-metrics', daemon=True).start()
+        logger.info(f"Serving Vizcal metrics on http://{host}:{self.server.server_address[1]}/metrics")
+
+    def close(self):
+        """Stops the HTTP server and writes a final text file."""
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        if self.textfile is not None:
+            self.write_textfile()
@@ -0,0 +1,114 @@
+"""
+Aggregated metrics reporting for Vizcal.
+
+Instead of logging every frame, per-topic metrics are folded into a fixed set of
+running aggregates and one summary record is emitted every `interval` frames of
+that topic. Aggregation is O(1) in time and memory per frame.
+"""
+
+import logging
+import threading
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsReporter:
+    """Per-topic rolling aggregates with one summary every `interval` frames."""
+
+    def __init__(self, interval, log=logger):
+        self.interval = interval
+        self.log = log
+        self.topics = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _empty():
+        return {
+            'frames': 0,
+            'analyzed': 0,
+            'shake': [0, 0.0, 0.0],     # count, sum, max
+            'movement': [0, 0.0, 0.0],  # count, sum, max
+            'movement_detected': 0,
+            'categories': Counter(),
+            'timings': {},              # stage -> [count, sum, max]
+        }
+
+    @staticmethod
+    def _add(aggregate, value):
+        aggregate[0] += 1
+        aggregate[1] += value
+        aggregate[2] = max(aggregate[2], value)
+
+    @staticmethod
+    def _summary(aggregate, digits=2):
+        count, total, maximum = aggregate
+        return {'mean': round(total / count, digits), 'max': round(maximum, digits)} if count else None
+
+    def update(self, topic_name, metrics, timings=None, analyzed=True):
+        """
+        Folds one frame's metrics into the topic's aggregates.
+
+        Args:
+            topic_name (str): Topic the frame belongs to.
+            metrics (dict): Frame metrics, e.g. "Average Shake Distance", "Movement Distance".
+            timings (dict, optional): Stage name to elapsed seconds for this frame.
+            analyzed (bool): Whether the metrics were computed for this frame or carried over.
+
+        Returns:
+            dict or None: The summary record when one was emitted for this frame.
+        """
+        if self.interval <= 0:
+            return None
+
+        with self.lock:
+            topic = self.topics.get(topic_name)
+            if topic is None:
+                topic = self.topics[topic_name] = self._empty()
+
+            topic['frames'] += 1
+            if analyzed:
+                topic['analyzed'] += 1
+                if (shake := metrics.get("Average Shake Distance")) is not None:
+                    self._add(topic['shake'], float(shake))
+                if (movement := metrics.get("Movement Distance")) is not None:
+                    self._add(topic['movement'], float(movement))
+                if metrics.get("Movement Detected"):
+                    topic['movement_detected'] += 1
+                if (category := metrics.get("Camera Stability Category")) is not None:
+                    topic['categories'][category] += 1
+                for stage, elapsed in (timings or {}).items():
+                    self._add(topic['timings'].setdefault(stage, [0, 0.0, 0.0]), elapsed * 1000.0)
+
+            if topic['frames'] < self.interval:
+                return None
+
+            self.topics[topic_name] = self._empty()
+
+        record = {
+            'topic': topic_name,
+            'frames': topic['frames'],
+            'analyzed': topic['analyzed'],
+            'shake_distance': self._summary(topic['shake']),
+            'movement_distance': self._summary(topic['movement']),
+            'movement_detected': topic['movement_detected'],
+            'stability_categories': dict(topic['categories']),
+            'timings_ms': {stage: self._summary(aggregate, 3) for stage, aggregate in topic['timings'].items()},
+        }
+        self.log.info(self.format(record))
+        return record
+
+    @staticmethod
+    def format(record):
+        """Formats a summary record as a single log line."""
+        parts = [f"topic={record['topic']}", f"frames={record['frames']}", f"analyzed={record['analyzed']}"]
+        for name in ('shake_distance', 'movement_distance'):
+            if (summary := record[name]) is not None:
+                parts.append(f"{name}={summary['mean']}/{summary['max']}")
+        if record['movement_distance'] is not None:
+            parts.append(f"movement_detected={record['movement_detected']}")
+        if record['stability_categories']:
+            parts.append("stability={" + ", ".join(f"{category}: {count}" for category, count in record['stability_categories'].items()) + "}")
+        if record['timings_ms']:
+            parts.append("timings_ms={" + ", ".join(f"{stage}: {summary['mean']}/{summary['max']}" for stage, summary in record['timings_ms'].items()) + "}")
+        return "Vizcal summary (mean/max) " + " ".join(parts)
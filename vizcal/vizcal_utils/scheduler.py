@@ -0,0 +1,89 @@
+"""
+Adaptive analysis scheduler for Vizcal.
+
+Tracks how long each topic's analysis takes against the interval at which its frames
+arrive. When the estimated load exceeds the budget, the analysis stride of the most
+expensive topic is raised (it is analyzed every N-th frame); when there is headroom
+again, strides are lowered back towards analyzing every frame.
+"""
+
+import threading
+
+
+class AnalysisScheduler:
+    """Per-topic analysis strides driven by measured processing latency."""
+
+    def __init__(self, target_load=0.8, max_stride=8, capacity=1, alpha=0.2):
+        self.target_load = target_load
+        self.max_stride = max(1, max_stride)
+        self.capacity = max(1, capacity)
+        self.alpha = alpha
+        self.topics = {}
+        self.lock = threading.Lock()
+
+    def _ema(self, current, value):
+        return value if current is None else current + self.alpha * (value - current)
+
+    def _topic(self, topic_name):
+        if topic_name not in self.topics:
+            self.topics[topic_name] = {'stride': 1, 'skipped': 0, 'cost': None, 'interval': None, 'last_ts': None}
+        return self.topics[topic_name]
+
+    def should_analyze(self, topic_name, timestamp):
+        """Records a frame arrival and returns whether this frame should be analyzed."""
+        with self.lock:
+            topic = self._topic(topic_name)
+
+            if topic['last_ts'] is not None and timestamp > topic['last_ts']:
+                topic['interval'] = self._ema(topic['interval'], timestamp - topic['last_ts'])
+            topic['last_ts'] = timestamp
+
+            if topic['skipped'] + 1 >= topic['stride']:
+                topic['skipped'] = 0
+                return True
+
+            topic['skipped'] += 1
+            return False
+
+    def record(self, topic_name, elapsed):
+        """Records the analysis time of a topic's frame and adapts the strides."""
+        with self.lock:
+            topic = self._topic(topic_name)
+            topic['cost'] = self._ema(topic['cost'], elapsed)
+            self._adapt()
+
+    def stride(self, topic_name):
+        """Returns the current analysis stride of a topic."""
+        with self.lock:
+            return self._topic(topic_name)['stride']
+
+    def load(self):
+        """Estimated fraction of real time spent analyzing, per unit of capacity."""
+        with self.lock:
+            return self._load()
+
+    def _contribution(self, topic, stride=None):
+        if topic['cost'] is None or not topic['interval']:
+            return 0.0
+        return topic['cost'] / ((stride or topic['stride']) * topic['interval'])
+
+    def _load(self):
+        return sum(self._contribution(topic) for topic in self.topics.values()) / self.capacity
+
+    def _adapt(self):
+        load = self._load()
+
+        if load > self.target_load:
+            # Back off the topic that costs the most per unit of time
+            candidates = [topic for topic in self.topics.values() if topic['stride'] < self.max_stride]
+            if candidates:
+                max(candidates, key=self._contribution)['stride'] += 1
+
+        else:
+            # Restore the most throttled topic if the budget still holds afterwards
+            candidates = [topic for topic in self.topics.values() if topic['stride'] > 1]
+            if candidates:
+                topic = max(candidates, key=lambda topic: topic['stride'])
+                increase = (self._contribution(topic, topic['stride'] - 1) - self._contribution(topic)) / self.capacity
+                if load + increase <= self.target_load * 0.9:
+                    topic['stride'] -= 1
@@ -0,0 +1,153 @@
+"""
+Process-sharded topic analysis for Vizcal.
+
+Topics are hashed onto a fixed set of worker processes. Each worker owns the
+analysis state of its topics for the lifetime of the filter, and image pixels
+travel through per-topic shared memory blocks instead of being pickled.
+"""
+
+import logging
+import multiprocessing as mp
+import traceback
+import zlib
+from multiprocessing import shared_memory
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def topic_shard(topic_name, num_shards):
+    """Return the shard index of a topic, stable across processes and restarts."""
+    return zlib.crc32(topic_name.encode()) % num_shards
+
+
+def shard_worker(conn, config):
+    """
+    Worker loop: analyzes frames for the topics hashed to this shard.
+
+    Each request is `(topic_name, shm_name, shape, dtype, data)`. The image is read from
+    and overlays are written back to the shared memory block. The reply is `('ok', data)`
+    with the output frame data, or `('error', traceback)`. A `None` request stops the worker.
+    """
+    from openfilter.filter_runtime.filter import Frame
+    from vizcal.filter import Vizcal, VizcalConfig
+
+    # Only the analysis half of the filter runs here, the Filter runtime stays in the parent
+    analyzer = Vizcal.__new__(Vizcal)
+    analyzer.setup(VizcalConfig(config, topic_workers=0, topic_processes=0, metrics_port=0, metrics_textfile=''))
+    segments = {}
+
+    try:
+        while (request := conn.recv()) is not None:
+            topic_name, shm_name, shape, dtype, data = request
+
+            try:
+                segment = segments.get(topic_name)
+                if segment is None or segment.name != shm_name:
+                    if segment is not None:
+                        segment.close()
+                    segment = segments[topic_name] = shared_memory.SharedMemory(name=shm_name)
+
+                image = np.ndarray(shape, dtype=dtype, buffer=segment.buf)
+                output = analyzer.process_topic(topic_name, Frame(image, data, 'BGR'), analyzer.get_topic_state(topic_name))
+                if not np.shares_memory(output.image, image):
+                    np.copyto(image, output.image)
+                reply = ('ok', output.data)
+
+            except Exception:
+                reply = ('error', traceback.format_exc())
+
+            # Drop views into the shared buffer so the segment can be closed or replaced
+            image = output = None
+            conn.send(reply)
+
+    finally:
+        analyzer.shutdown()
+        for segment in segments.values():
+            segment.close()
+        conn.close()
+
+
+class ShardPool:
+    """Fixed set of worker processes, each owning the topic state of its shard."""
+
+    def __init__(self, num_shards, config):
+        ctx = mp.get_context('spawn')
+        self.connections = []
+        self.processes = []
+        self.segments = {}
+
+        for index in range(num_shards):
+            parent_conn, child_conn = ctx.Pipe()
+            process = ctx.Process(target=shard_worker, args=(child_conn, dict(config)), name=f'vizcal-shard-{index}', daemon=True)
+            process.start()
+            child_conn.close()
+            self.connections.append(parent_conn)
+            self.processes.append(process)
+
+        logger.info(f"Started {num_shards} Vizcal shard worker processes")
+
+    def segment_for(self, topic_name, image):
+        """Return the topic's shared memory block, (re)allocating it if the image no longer fits."""
+        segment = self.segments.get(topic_name)
+        if segment is None or segment.size < image.nbytes:
+            if segment is not None:
+                segment.close()
+                segment.unlink()
+            segment = self.segments[topic_name] = shared_memory.SharedMemory(create=True, size=image.nbytes)
+        return segment
+
+    def process(self, items):
+        """
+        Analyzes `(topic_name, image, data)` items on their shard workers.
+
+        All requests are dispatched before any reply is awaited, so shards run concurrently.
+
+        Returns:
+            list: `(data, image)` per item in input order. `image` is a view into shared
+            memory holding the analyzed (possibly overlaid) frame, valid until the next call.
+        """
+        pending = []
+        for topic_name, image, data in items:
+            segment = self.segment_for(topic_name, image)
+            view = np.ndarray(image.shape, dtype=image.dtype, buffer=segment.buf)
+            np.copyto(view, image)
+            conn = self.connections[topic_shard(topic_name, len(self.connections))]
+            conn.send((topic_name, segment.name, image.shape, image.dtype.str, data))
+            pending.append((topic_name, conn, view))
+
+        # Drain every reply before raising so the pipes stay in sync
+        results, errors = [], []
+        for topic_name, conn, view in pending:
+            status, payload = conn.recv()
+            if status != 'ok':
+                errors.append(f"{topic_name}: {payload}")
+            results.append((payload, view))
+
+        if errors:
+            raise RuntimeError("Vizcal shard worker failed\n" + "\n".join(errors))
+
+        return results
+
+    def close(self):
+        """Stops the workers and releases the shared memory blocks."""
+        for conn in self.connections:
+            try:
+                conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+        for conn in self.connections:
+            conn.close()
+
+        for segment in self.segments.values():
+            segment.close()
+            segment.unlink()
+
+        self.connections, self.processes, self.segments = [], [], {}
@@ -0,0 +1,49 @@
+"""
+Temporal smoothing of per-topic metrics for Vizcal.
+
+Keeps an exponential moving average plus the mean and max over the last `window`
+values in a fixed-size ring buffer, each updated in O(1) (amortized for the max),
+so classifications can use smoothed signals without keeping frame history.
+"""
+
+from collections import deque
+
+
+class RollingStats:
+    """EMA and windowed mean/max of a scalar series."""
+
+    def __init__(self, window=15, alpha=0.3):
+        self.values = [0.0] * max(1, window)
+        self.alpha = alpha
+        self.index = 0
+        self.count = 0
+        self.total = 0.0
+        self.ema = None
+        self.max_candidates = deque()  # (sequence number, value), values decreasing
+
+    def update(self, value):
+        """
+        Adds a value and returns the current `(ema, window mean, window max)`.
+        """
+        window = len(self.values)
+        if self.count >= window:
+            self.total -= self.values[self.index]
+        self.values[self.index] = value
+        self.total += value
+        self.count += 1
+        self.index = (self.index + 1) % window
+
+        # Recompute the running sum once per pass over the buffer so float error cannot accumulate
+        if self.index == 0:
+            self.total = sum(self.values)
+
+        # Monotonic queue: older values smaller than the new one can never be the max again
+        while self.max_candidates and self.max_candidates[-1][1] <= value:
+            self.max_candidates.pop()
+        self.max_candidates.append((self.count, value))
+        if self.max_candidates[0][0] <= self.count - window:
+            self.max_candidates.popleft()
+
+        self.ema = value if self.ema is None else self.ema + self.alpha * (value - self.ema)
+
+        return self.ema, self.total / min(self.count, window), self.max_candidates[0][1]
@@ -0,0 +1,68 @@
+"""
+Per-stage timing instrumentation for Vizcal.
+
+Stages of a frame's processing add their elapsed time to a per-frame dict with
+`add_timing`. When stage timing is enabled, each topic folds those dicts into
+fixed-size rolling histograms. A topic is only ever processed by one thread at
+a time, so the histograms are written without locks.
+"""
+
+import time
+
+import numpy as np
+
+# Reserved frame data key the per-topic stage timing summary is published under
+STAGE_TIMING_KEY = '_vizcal_timing'
+
+
+def add_timing(timings, stage, start):
+    """Add the time elapsed since `start` to `stage` in `timings` (if given) and return the current time."""
+    now = time.perf_counter()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + (now - start)
+    return now
+
+
+class RollingHistogram:
+    """Ring buffer of the last `window` samples with percentile queries."""
+
+    def __init__(self, window=512):
+        self.samples = np.zeros(max(1, window), dtype=np.float64)
+        self.count = 0
+
+    def add(self, value):
+        self.samples[self.count % len(self.samples)] = value
+        self.count += 1
+
+    def percentiles(self, q=(50, 95, 99)):
+        """Percentiles of the samples in the window, or None before the first sample."""
+        filled = min(self.count, len(self.samples))
+        if not filled:
+            return None
+        return np.percentile(self.samples[:filled], q)
+
+
+class StageTimings:
+    """Rolling latency histograms of a topic's processing stages."""
+
+    def __init__(self, window=512):
+        self.window = window
+        self.histograms = {}
+
+    def record(self, timings):
+        """Fold one frame's `{stage: seconds}` into the histograms."""
+        for stage, elapsed in timings.items():
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = RollingHistogram(self.window)
+            histogram.add(elapsed)
+
+    def summary(self):
+        """Per-stage sample count and p50/p95/p99 latency in milliseconds."""
+        summary = {}
+        for stage, histogram in list(self.histograms.items()):
+            percentiles = histogram.percentiles()
+            if percentiles is not None:
+                p50, p95, p99 = (round(float(value) * 1000.0, 3) for value in percentiles)
+                summary[stage] = {'count': histogram.count, 'p50_ms': p50, 'p95_ms': p95, 'p99_ms': p99}
+        return summary
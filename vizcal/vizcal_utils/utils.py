@@ -1,15 +1,28 @@
 import numpy as np
 
+# Types that are already serializable and need no conversion
+NATIVE_TYPES = frozenset((str, int, float, bool, type(None)))
+
+def to_serializable(value):
+    """Return `value` with NumPy scalars and arrays converted to native Python types, without mutating it."""
+    value_type = type(value)
+    if value_type in NATIVE_TYPES:
+        return value
+    if isinstance(value, dict):
+        return {key: to_serializable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_serializable(item) for item in value]
+    if isinstance(value, np.ndarray):
+        # tolist() converts elements (including bools) to native types
+        return value.tolist()
+    if isinstance(value, np.generic):
+        # Convert numpy scalars (e.g., uint8, float64, bool_) to native Python types
+        return value.item()
+    return value
+
 # Helper function to convert non-serializable types
 def convert_dict_to_serializable(d):
     for key, value in d.items():
-        if isinstance(value, dict):
-            # Recursively handle nested dictionaries
-            d[key] = convert_dict_to_serializable(value)
-        elif isinstance(value, np.uint8):
-            # Convert uint8 to int
-            d[key] = int(value)
-        elif isinstance(value, np.generic):
-            # Convert other numpy types (e.g., int32, float64) to native Python types
-            d[key] = value.item()
+        if type(value) not in NATIVE_TYPES:
+            d[key] = to_serializable(value)
     return d
@@ -1,9 +1,14 @@
 import cv2
 import numpy as np
 import os
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from skimage.restoration import estimate_sigma as skimage_estimate_sigma
 
+from vizcal.vizcal_utils.timing import add_timing
+
 from typing import Any, Dict, List, Union
 
 KEYS_TO_INCLUDE = {
@@ -76,6 +81,95 @@ def text_on_image(image, data_dict):
 
     return image
 
+class OverlayCompositor:
+    """
+    Overlay renderer equivalent to `text_on_image` followed by `flag_stability`.
+
+    Only the static parts are cached: the key labels and the stability light of each category
+    are rendered once per frame size into small BGRA sprites and alpha-blended into their region
+    of the frame with saturating uint8 arithmetic. The values change almost every frame, so they
+    are drawn directly with `cv2.putText` after their label.
+    """
+
+    font = cv2.FONT_HERSHEY_SIMPLEX
+    font_scale = 0.5
+    font_color = (255, 255, 255)
+    thickness = 1
+    light_radius = 10
+
+    def __init__(self):
+        self.shape = None
+        self.labels = []  # (sprite, value origin) per line of KEYS_TO_INCLUDE
+        self.lights = {}  # stable -> sprite
+
+    @staticmethod
+    def compile_sprite(sprite, y, x, shape):
+        """Clip a BGRA sprite placed at (y, x) to the frame and precompute its blend planes."""
+        y0, x0 = max(y, 0), max(x, 0)
+        y1, x1 = min(y + sprite.shape[0], shape[0]), min(x + sprite.shape[1], shape[1])
+        if y1 <= y0 or x1 <= x0:
+            return None
+
+        sprite = sprite[y0 - y:y1 - y, x0 - x:x1 - x]
+        alpha = sprite[..., 3:].astype(np.uint16)
+        inverse_alpha = np.repeat(255 - sprite[..., 3:], 3, axis=2)
+        premultiplied = ((sprite[..., :3] * alpha + 127) // 255).astype(np.uint8)
+        return (slice(y0, y1), slice(x0, x1)), inverse_alpha, premultiplied
+
+    @staticmethod
+    def blend(image, sprite):
+        if sprite is not None:
+            region, inverse_alpha, premultiplied = sprite
+            roi = image[region]
+            cv2.multiply(roi, inverse_alpha, dst=roi, scale=1 / 255)
+            cv2.add(roi, premultiplied, dst=roi)
+
+    def render_labels(self, shape):
+        """Label sprites and value origins of the text lines, laid out like text_on_image."""
+        labels = []
+        for index, key in enumerate(KEYS_TO_INCLUDE):
+            label = f"{key}: "
+            y = 30 + 25 * index
+            (width, height), baseline = cv2.getTextSize(label, self.font, self.font_scale, self.thickness)
+            top = y - height - 2
+            coverage = np.zeros((height + baseline + 4, 10 + width), dtype=np.uint8)
+            cv2.putText(coverage, label, (10, y - top), self.font, self.font_scale, 255, self.thickness, cv2.LINE_AA)
+            sprite = np.zeros(coverage.shape + (4,), dtype=np.uint8)
+            sprite[..., :3] = self.font_color
+            sprite[..., 3] = coverage
+            # The reported width includes the stroke thickness, the glyph advance does not
+            labels.append((self.compile_sprite(sprite, top, 0, shape), (10 + width - self.thickness, y)))
+        return labels
+
+    def render_light(self, stable, shape):
+        """Stability light sprite, placed like flag_stability."""
+        radius = self.light_radius
+        light = np.zeros((2 * radius + 1, 2 * radius + 1, 4), dtype=np.uint8)
+        cv2.circle(light, (radius, radius), radius, (0, 255, 0, 255) if stable else (0, 0, 255, 255), -1)
+        return self.compile_sprite(light, 50 - radius, shape[1] - 50 - radius, shape)
+
+    def render(self, image, data_dict):
+        """Draws the overlays into `image` in place and returns it."""
+        if image is None:
+            raise ValueError("Image not found or cannot be opened")
+
+        if image.shape[:2] != self.shape:
+            self.shape = image.shape[:2]
+            self.labels = self.render_labels(image.shape)
+            self.lights = {}
+
+        for key, (sprite, origin) in zip(KEYS_TO_INCLUDE, self.labels):
+            self.blend(image, sprite)
+            value = data_dict.get(key, None)
+            cv2.putText(image, str(value if value is not None else 'N/A'), origin, self.font, self.font_scale, self.font_color, self.thickness, cv2.LINE_AA)
+
+        stable = data_dict["Camera Stability Category"] == "Video is Stable"
+        if stable not in self.lights:
+            self.lights[stable] = self.render_light(stable, image.shape)
+        self.blend(image, self.lights[stable])
+
+        return image
+
 def calc_video_properties(video_path):
     """Calculate various properties of a video file."""
     cap = cv2.VideoCapture(video_path)
@@ -123,12 +217,98 @@ def calc_video_properties(video_path):
     cap.release()
     return video_properties
 
-def calc_frame_properties(frame):
-    """Calculate various properties of a single video frame."""
+# Process-wide probe cache: (source, mtime, size) -> Future of calc_video_properties
+_video_properties_cache = {}
+_video_properties_lock = threading.Lock()
+_video_properties_executor = None
+
+def video_properties_cache_key(video_path):
+    """Cache key of a probe: the source plus file mtime and size when it is a local file."""
+    try:
+        stat = os.stat(video_path)
+        return (video_path, stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return (video_path, None, None)
+
+def _probe_video_properties(video_path, key):
+    """Run the probe, evicting failed results so a later request can retry."""
+    try:
+        video_properties = calc_video_properties(video_path)
+    except Exception:
+        video_properties = None
+
+    if not video_properties or video_properties.get('Frame Width') is None:
+        with _video_properties_lock:
+            _video_properties_cache.pop(key, None)
+
+    if video_properties is None:
+        raise RuntimeError(f"Could not probe video properties of {video_path}")
+
+    return video_properties
+
+def probe_video_properties_async(video_path):
+    """
+    Return a Future with the video properties of `video_path`.
+
+    The probe runs on a background thread so opening the source never blocks the frame path,
+    and successful results are shared process-wide by every caller probing the same source.
+    """
+    global _video_properties_executor
+
+    key = video_properties_cache_key(video_path)
+    with _video_properties_lock:
+        future = _video_properties_cache.get(key)
+        if future is None:
+            if _video_properties_executor is None:
+                _video_properties_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='vizcal-probe')
+            future = _video_properties_cache[key] = _video_properties_executor.submit(_probe_video_properties, video_path, key)
+
+    return future
+
+def frame_resolution(frame_shape):
+    """Resolution properties of a frame, taken from its shape."""
+    frame_height, frame_width = frame_shape[:2]
+    return {
+        "Frame Width": frame_width,
+        "Frame Height": frame_height,
+        "Frame Size (pixels)": f"{frame_width}x{frame_height}",
+    }
+
+class StreamPropertiesEstimator:
+    """
+    Rolling estimate of stream properties from frame shapes and timestamps.
+
+    Works for every source type (files, rtsp, tcp/zmq upstreams) since it never touches
+    the source: throughput comes from frame timestamps and the frame size.
+    """
+
+    def __init__(self, window=30):
+        self.timestamps = deque(maxlen=max(2, window + 1))
+
+    def update(self, frame_shape, timestamp):
+        """Record a frame and return the current rolling throughput estimate."""
+        self.timestamps.append(timestamp)
+        frame_height, frame_width = frame_shape[:2]
+
+        if len(self.timestamps) < 2:
+            return {}
+
+        intervals = np.diff(np.fromiter(self.timestamps, dtype=np.float64))
+        mean_interval = float(intervals.mean())
+        fps = 1 / mean_interval if mean_interval > 0 else 0.0
+        return {
+            "Effective FPS": round(fps, 2),
+            "Frame Interval Jitter (ms)": round(float(intervals.std()) * 1000, 2),
+            "Effective Megapixels per Second": round(frame_width * frame_height * fps / 1e6, 2),
+        }
+
+def calc_frame_properties(frame, gray_frame=None):
+    """Calculate various properties of a single video frame, reusing `gray_frame` if already converted."""
     start_time = time.time()
 
     # Convert frame to grayscale and HSV color space
-    gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    if gray_frame is None:
+        gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
     hsv_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
 
     # Calculate noise estimate and SNR
@@ -173,44 +353,296 @@ def check_all_pixels_moving(prev_frame, curr_frame, threshold=10):
     change_percentage = (np.sum(thresh > 0) / thresh.size) * 100
     return change_percentage, change_percentage > 50
 
-def detect_camera_shake(prev_frame, curr_frame, shake_threshold=10):
-    """Detect camera shake between two frames using ORB features."""
-    prev_gray = cv2.cvtColor(prev_frame, cv2.COLOR_BGR2GRAY)
-    curr_gray = cv2.cvtColor(curr_frame, cv2.COLOR_BGR2GRAY)
+def crop_to_roi(image, roi):
+    """
+    Return a zero-copy view of `image` restricted to `roi` = [x, y, width, height].
 
-    orb = cv2.ORB_create()
-    kp1, des1 = orb.detectAndCompute(prev_gray, None)
-    kp2, des2 = orb.detectAndCompute(curr_gray, None)
+    The ROI is clipped to the image bounds; a missing or empty ROI returns the whole image.
+    """
+    if not roi:
+        return image
+
+    x, y, w, h = (int(v) for v in roi)
+    x0, y0 = max(0, x), max(0, y)
+    x1, y1 = min(image.shape[1], x + w), min(image.shape[0], y + h)
+    if x1 <= x0 or y1 <= y0:
+        return image
 
-    bf = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=True)
-    matches = bf.match(des1, des2)
+    return image[y0:y1, x0:x1]
 
-    # avg_distance = np.mean([m.distance for m in matches])
-    ##
-    # Sort matches by distance
-    matches = sorted(matches, key=lambda x: x.distance)
+def analysis_size(shape, analysis_scale=1.0, analysis_max_width=0):
+    """Return `(scale, (width, height))` of the analysis image for a frame of the given shape."""
+    height, width = shape[:2]
 
-    # Extract location of good matches
-    src_pts = np.float32([kp1[m.queryIdx].pt for m in matches])
-    dst_pts = np.float32([kp2[m.trainIdx].pt for m in matches])
+    scale = analysis_scale if 0 < analysis_scale < 1 else 1.0
+    if analysis_max_width and width * scale > analysis_max_width:
+        scale = analysis_max_width / width
 
-    # Calculate transformation matrix
-    matrix, mask = cv2.estimateAffinePartial2D(src_pts, dst_pts)
+    if scale >= 1.0:
+        return 1.0, (width, height)
+
+    return scale, (max(1, round(width * scale)), max(1, round(height * scale)))
+
+def downscale_for_analysis(gray, analysis_scale=1.0, analysis_max_width=0, dst=None):
+    """
+    Downscale a full-resolution grayscale frame to the configured analysis size.
+
+    Returns the analysis image and the scale applied relative to the full-resolution frame,
+    so that measured pixel distances can be mapped back with `distance / scale`. If given,
+    `dst` must be a uint8 buffer of the analysis size and receives the downscaled image.
+    """
+    scale, size = analysis_size(gray.shape, analysis_scale, analysis_max_width)
 
-    # If transformation matrix is None, return False
+    if scale < 1.0:
+        gray = cv2.resize(gray, size, dst=dst, interpolation=cv2.INTER_AREA)
+
+    return gray, scale
+
+def extract_orb_features(gray_frame, orb=None):
+    """
+    Detect ORB keypoints and compute their descriptors for a grayscale frame.
+
+    Returns `(points, descriptors)` with keypoint coordinates as an (N, 2) float32 array,
+    converted once here so matching never touches KeyPoint objects. Both are None when
+    no keypoints are found, like the descriptors returned by OpenCV.
+    """
+    if orb is None:
+        orb = cv2.ORB_create()
+    keypoints, descriptors = orb.detectAndCompute(gray_frame, None)
+    points = cv2.KeyPoint_convert(keypoints) if keypoints else None
+    return points, descriptors
+
+def estimate_translation(prev_features, curr_features, matcher=None, max_matches=0, timings=None):
+    """
+    Estimate the (dx, dy) translation between the precomputed ORB features of two frames.
+
+    With `max_matches` only the best matches by descriptor distance are used for the
+    affine estimate. Returns None when no transform can be estimated. Matching and affine
+    estimation times are added to `timings` under 'match' and 'affine' if given.
+    """
+    pts1, des1 = prev_features
+    pts2, des2 = curr_features
+
+    # Not enough texture in one of the frames to estimate a transform
+    if des1 is None or des2 is None:
+        return None
+
+    if matcher is None:
+        matcher = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=True)
+    start = time.perf_counter()
+    matches = matcher.match(des1, des2)
+    if len(matches) < 3:
+        add_timing(timings, 'match', start)
+        return None
+
+    # Gather match indices in one pass; estimateAffinePartial2D does not depend on match order
+    indices = np.array([(m.queryIdx, m.trainIdx) for m in matches], dtype=np.intp)
+    if 3 <= max_matches < len(matches):
+        distances = np.fromiter((m.distance for m in matches), dtype=np.float32, count=len(matches))
+        indices = indices[np.argpartition(distances, max_matches - 1)[:max_matches]]
+    start = add_timing(timings, 'match', start)
+
+    # Calculate transformation matrix from the location of good matches
+    matrix, mask = cv2.estimateAffinePartial2D(pts1[indices[:, 0]], pts2[indices[:, 1]])
+    add_timing(timings, 'affine', start)
     if matrix is None:
-        return False
+        return None
 
     # Extract translation components
-    dx = matrix[0, 2]
-    dy = matrix[1, 2]
+    return matrix[:, 2].copy()
 
-    # Calculate Euclidean distance of translation
-    avg_distance = np.sqrt(dx**2 + dy**2)
-    ##
+def estimate_camera_shake(prev_features, curr_features, shake_threshold=10, matcher=None, scale=1.0, max_matches=0):
+    """
+    Estimate camera shake from the precomputed ORB features of two frames.
+
+    `scale` is the analysis downscale factor of the features; the translation is divided
+    by it so the distance is reported in full-resolution pixels.
+    """
+    translation = estimate_translation(prev_features, curr_features, matcher, max_matches)
+
+    # If no transform could be estimated, report no shake
+    if translation is None:
+        return 0.0, False
+
+    # Calculate Euclidean distance of translation in full-resolution pixels
+    avg_distance = np.sqrt(translation[0]**2 + translation[1]**2) / scale
     
     return avg_distance, avg_distance > shake_threshold
 
+def track_translation(prev_gray, curr_gray, points, lk_params, min_points=8):
+    """
+    Track points between two grayscale frames with sparse LK and estimate their translation.
+
+    Returns `(translation, tracked_points)`, or `(None, None)` when fewer than
+    `min_points` points survive tracking or no transform can be estimated.
+    """
+    p0 = points.reshape(-1, 1, 2)
+    p1, st, _ = cv2.calcOpticalFlowPyrLK(prev_gray, curr_gray, p0, None, **lk_params)
+    if p1 is None or st is None:
+        return None, None
+
+    good = st.reshape(-1) == 1
+    if good.sum() < min_points:
+        return None, None
+
+    good_old, good_new = p0[good].reshape(-1, 2), p1[good].reshape(-1, 2)
+    matrix, mask = cv2.estimateAffinePartial2D(good_old, good_new)
+    if matrix is None:
+        return None, None
+
+    return matrix[:, 2].copy(), good_new
+
+def track_points_lk(prev_gray, curr_gray, points, lk_params, fb_threshold=0.0):
+    """
+    Track points between two grayscale frames with pyramidal LK.
+
+    With `fb_threshold` > 0 points are also tracked back into the previous frame and
+    rejected when they do not return within that many pixels of where they started.
+    Returns `(good_old, good_new)` as (N, 2) float32 arrays.
+    """
+    p1, st, _ = cv2.calcOpticalFlowPyrLK(prev_gray, curr_gray, points, None, **lk_params)
+    if p1 is None or st is None:
+        empty = np.empty((0, 2), dtype=np.float32)
+        return empty, empty
+
+    good = st.reshape(-1) == 1
+    if fb_threshold > 0:
+        p0_back, st_back, _ = cv2.calcOpticalFlowPyrLK(curr_gray, prev_gray, p1, None, **lk_params)
+        fb_error = np.linalg.norm((points - p0_back).reshape(-1, 2), axis=1)
+        good &= (st_back.reshape(-1) == 1) & (fb_error < fb_threshold)
+
+    return points.reshape(-1, 2)[good], p1.reshape(-1, 2)[good]
+
+def replenish_points(gray, points, feature_params, target_points=100, grid=4, cell_retry=None, retry_interval=10):
+    """
+    Top up tracked points in the grid cells that have lost their features.
+
+    The frame is split into `grid` x `grid` cells sharing `target_points`. Cells down to half
+    their share are re-detected on their own sub-image, masking out the neighbourhood of points
+    still tracked there, so per-frame cost stays small and steady. Cells where detection finds
+    nothing are skipped for `retry_interval` frames via the `cell_retry` countdown array.
+    Returns the points as an (N, 1, 2) float32 array.
+    """
+    pts = np.empty((0, 2), dtype=np.float32) if points is None else points.reshape(-1, 2)
+    if len(pts) >= target_points:
+        return pts.reshape(-1, 1, 2)
+
+    height, width = gray.shape[:2]
+    per_cell = -(-target_points // (grid * grid))
+    cell_w, cell_h = width / grid, height / grid
+    min_distance = int(feature_params.get('minDistance', 7))
+
+    cols = np.clip((pts[:, 0] // cell_w).astype(int), 0, grid - 1)
+    rows = np.clip((pts[:, 1] // cell_h).astype(int), 0, grid - 1)
+    counts = np.bincount(rows * grid + cols, minlength=grid * grid).reshape(grid, grid)
+
+    found_points = [pts]
+    for row, col in zip(*np.nonzero(counts <= per_cell // 2)):
+        if cell_retry is not None and cell_retry[row, col] > 0:
+            cell_retry[row, col] -= 1
+            continue
+
+        x0, x1 = int(col * cell_w), int((col + 1) * cell_w)
+        y0, y1 = int(row * cell_h), int((row + 1) * cell_h)
+        cell = gray[y0:y1, x0:x1]
+
+        # Keep new corners away from points still tracked in this cell
+        mask = None
+        in_cell = pts[(rows == row) & (cols == col)]
+        if len(in_cell):
+            mask = np.full(cell.shape, 255, dtype=np.uint8)
+            for x, y in in_cell:
+                cv2.circle(mask, (int(x) - x0, int(y) - y0), min_distance, 0, -1)
+
+        found = cv2.goodFeaturesToTrack(cell, mask=mask, **{**feature_params, 'maxCorners': int(per_cell - counts[row, col])})
+        if found is None:
+            if cell_retry is not None:
+                cell_retry[row, col] = retry_interval
+            continue
+
+        found_points.append(found.reshape(-1, 2) + np.float32([x0, y0]))
+
+    return np.concatenate(found_points).astype(np.float32).reshape(-1, 1, 2)
+
+class DenseFlowEngine:
+    """Dense optical flow on a heavily downscaled grayscale frame, for texture-independent movement."""
+
+    def __init__(self, method='dis', max_width=160):
+        self.method = method
+        self.max_width = max_width
+        self.dis = cv2.DISOpticalFlow_create(cv2.DISOPTICAL_FLOW_PRESET_ULTRAFAST) if method == 'dis' else None
+        self.prev_small = None
+
+    def update(self, gray):
+        """
+        Compute dense flow from the previous frame to `gray`.
+
+        Returns `(flow, scale)` with the (H, W, 2) flow field and the downscale factor applied to
+        `gray`, or `(None, scale)` on the first frame or after a resolution change.
+        """
+        scale, size = analysis_size(gray.shape, analysis_max_width=self.max_width)
+        small = cv2.resize(gray, size, interpolation=cv2.INTER_AREA) if scale < 1.0 else gray.copy()
+        prev_small, self.prev_small = self.prev_small, small
+
+        if prev_small is None or prev_small.shape != small.shape:
+            return None, scale
+
+        if self.dis is not None:
+            return self.dis.calc(prev_small, small, None), scale
+
+        return cv2.calcOpticalFlowFarneback(prev_small, small, None, 0.5, 3, 15, 3, 5, 1.2, 0), scale
+
+def summarize_flow(flow, scale=1.0, movement_threshold=1.0):
+    """
+    Summarize a dense flow field in full-resolution pixels.
+
+    Returns the mean flow magnitude, the global (median) motion vector and the fraction of
+    pixels moving by more than `movement_threshold`.
+    """
+    flow = flow.reshape(-1, 2) / scale
+    magnitude = np.sqrt(flow[:, 0]**2 + flow[:, 1]**2)
+    global_motion = np.median(flow, axis=0)
+    return float(magnitude.mean()), global_motion, float(np.count_nonzero(magnitude > movement_threshold)) / len(magnitude)
+
+class StabilityEngine:
+    """ORB detector, descriptor matcher and LK tracker reused across frames of a single topic."""
+
+    def __init__(self, nfeatures=500, scale_factor=1.2, nlevels=8, fast_threshold=20, max_matches=0):
+        self.orb = cv2.ORB_create(nfeatures=nfeatures, scaleFactor=scale_factor, nlevels=nlevels, fastThreshold=fast_threshold)
+        self.matcher = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=True)
+        self.max_matches = max_matches
+        self.lk_params = dict(winSize=(21, 21), maxLevel=3, criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
+
+    def extract(self, gray_frame, timings=None):
+        """Detect ORB keypoints and descriptors with the configured detector."""
+        start = time.perf_counter()
+        features = extract_orb_features(gray_frame, self.orb)
+        add_timing(timings, 'orb', start)
+        return features
+
+    def translation(self, prev_features, curr_features, timings=None):
+        """Estimate the translation between two feature sets with the shared matcher."""
+        return estimate_translation(prev_features, curr_features, self.matcher, self.max_matches, timings)
+
+    def track(self, prev_gray, curr_gray, points, timings=None):
+        """Track points into the current frame and estimate the frame-to-frame translation."""
+        start = time.perf_counter()
+        result = track_translation(prev_gray, curr_gray, points, self.lk_params)
+        # Kept apart from the movement tracker's 'lk' stage so both can be tuned separately
+        add_timing(timings, 'shake_lk', start)
+        return result
+
+def detect_camera_shake(prev_frame, curr_frame, shake_threshold=10):
+    """Detect camera shake between two frames using ORB features."""
+    prev_gray = cv2.cvtColor(prev_frame, cv2.COLOR_BGR2GRAY)
+    curr_gray = cv2.cvtColor(curr_frame, cv2.COLOR_BGR2GRAY)
+
+    orb = cv2.ORB_create()
+    prev_features = extract_orb_features(prev_gray, orb)
+    curr_features = extract_orb_features(curr_gray, orb)
+
+    return estimate_camera_shake(prev_features, curr_features, shake_threshold)
+
 def calc_camera_stability(video_path):
     """Calculate camera stability metrics for a video."""
     cap = cv2.VideoCapture(video_path)